@@ -11,7 +11,11 @@ import numpy as np
 # In[2]:
 
 
-df=pd.read_csv("hotel_bookings.csv")
+# Clean in fixed-size chunks (fillna, total_nights, revenue, arrival_date; see cleaning.py)
+# and save cleaned data; prints rows/sec as it goes
+from cleaning import clean_file
+df = clean_file("hotel_bookings.csv", "hotel_bookings_cleaned.csv", chunksize=100_000)
+print("Data cleaning completed. Saved to 'hotel_bookings_cleaned.csv'.")
 
 
 # In[3]:
@@ -29,34 +33,10 @@ df.isnull().sum()
 # In[6]:
 
 
-# Handle missing values (avoid inplace=True)
-df['agent'] = df['agent'].fillna(0)
-df['company'] = df['company'].fillna(0)
-df['children'] = df['children'].fillna(0)  # Assume 0 children if missing
-df['country'] = df['country'].fillna('Unknown') 
-
-
-# In[7]:
-
-
-# Calculate total nights and revenue
-df['total_nights'] = df['stays_in_weekend_nights'] + df['stays_in_week_nights']
-df['revenue'] = df['adr'] * df['total_nights']
-
-# Create a unified date column for easier analysis
-df['arrival_date'] = pd.to_datetime(
-    df['arrival_date_year'].astype(str) + '-' + 
-    df['arrival_date_month'] + '-' + 
-    df['arrival_date_day_of_month'].astype(str),
-    format='%Y-%B-%d'
-)
-
-# Drop unnecessary columns (optional, adjust as needed)
-df = df.drop(columns=['reservation_status_date', 'agent', 'company'])
-
-# Save cleaned data
-df.to_csv("hotel_bookings_cleaned.csv", index=False)
-print("Data cleaning completed. Saved to 'hotel_bookings_cleaned.csv'.")
+# Also save a typed, memory-mappable columnar copy (category codes, int8 flags, datetime64)
+from columnar_store import save_columnar
+save_columnar(df, "hotel_bookings_cleaned.store")
+print("Saved columnar copy to 'hotel_bookings_cleaned.store'.")
 
 
 # # Data Visualisation
@@ -69,15 +49,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-# Load cleaned data
-df = pd.read_csv("hotel_bookings_cleaned.csv")
-
-
-# In[10]:
-
-
-# Convert arrival_date to datetime (if not already)
-df['arrival_date'] = pd.to_datetime(df['arrival_date'])
+# Use the cleaned frame from above (arrival_date is already datetime64)
 
 
 # In[11]:
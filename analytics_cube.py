@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# File: analytics_cube.py
+import os
+
+import numpy as np
+import pandas as pd
+
+from columnar_store import read_meta, store_version, write_meta
+
+MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+               'August', 'September', 'October', 'November', 'December']
+FILTER_INDEX_DIR = 'filter_index'
+
+
+# Where a store keeps its filter index, and the store version the files must match
+def store_filter_index(store_path: str) -> tuple:
+    return os.path.join(store_path, FILTER_INDEX_DIR), store_version(store_path)
+
+
+# Precomputed aggregates over the booking frame. Built once per data load so the
+# reports are answered from a handful of small arrays instead of the full table.
+class AnalyticsCube:
+    def __init__(self, data: pd.DataFrame, index_path: str = None, index_version=None):
+        booked = data['is_canceled'] == 0
+        months = data['arrival_date'].dt.to_period('M')
+
+        # Overall counts
+        self.total_bookings = int(len(data))
+        self.total_canceled = int((~booked).sum())
+        self.booked_count = int(booked.sum())
+        self.booked_revenue = float(data.loc[booked, 'revenue'].sum())
+
+        # Monthly revenue / booking / cancellation counts, sorted by month
+        monthly = pd.DataFrame({
+            'revenue': data['revenue'].where(booked, 0.0),
+            'booked': booked.astype(np.int64),
+            'canceled': (~booked).astype(np.int64),
+        }).groupby(months).sum()
+        self.month_start = monthly.index.to_timestamp().values.astype('datetime64[M]')
+        self.month_revenue = monthly['revenue'].to_numpy(np.float64)
+        self.month_booked = monthly['booked'].to_numpy(np.int64)
+        self.month_canceled = monthly['canceled'].to_numpy(np.int64)
+
+        # Per-country counts, ordered like value_counts() on non-canceled bookings
+        booked_counts = data.loc[booked, 'country'].value_counts()
+        canceled_counts = data.loc[~booked, 'country'].value_counts()
+        countries = booked_counts.index.append(canceled_counts.index.difference(booked_counts.index))
+        self.country_names = countries.to_numpy(dtype=object)
+        self.country_booked = booked_counts.reindex(countries, fill_value=0).to_numpy(np.int64)
+        self.country_canceled = canceled_counts.reindex(countries, fill_value=0).to_numpy(np.int64)
+
+        # Group index for the structured query engine: sums per
+        # (hotel, country, year, month, is_canceled), small enough to filter per question
+        self.groups = pd.DataFrame({
+            'hotel': data['hotel'].astype(str),
+            'country': data['country'].astype(str),
+            'year': data['arrival_date'].dt.year,
+            'month': data['arrival_date'].dt.month,
+            'is_canceled': data['is_canceled'].astype(np.int64),
+            'bookings': np.int64(1),
+            'revenue': data['revenue'],
+            'lead_time': data['lead_time'],
+            'adr': data['adr'],
+            'nights': data['total_nights'],
+        }).groupby(['hotel', 'country', 'year', 'month', 'is_canceled'], sort=False).sum().reset_index()
+        self.groups['canceled'] = self.groups['bookings'] * self.groups['is_canceled']
+
+        # Row index for filtered reports (date range + dimension filters); shared through
+        # files under index_path when given (see FilterIndex)
+        self.rows = FilterIndex(data, index_path, index_version)
+
+        # Lead time histogram: one count per distinct lead time value
+        lead_counts = data['lead_time'].value_counts().sort_index()
+        self.lead_values = lead_counts.index.to_numpy()
+        self.lead_counts = lead_counts.to_numpy(np.int64)
+
+    def cancellation_rate(self) -> float:
+        if self.total_bookings == 0:
+            return 0.0
+        return self.total_canceled / self.total_bookings * 100
+
+    def average_revenue(self) -> float:
+        if self.booked_count == 0:
+            return float('nan')
+        return self.booked_revenue / self.booked_count
+
+    # Headline aggregates attached to LLM prompts (see context_builder.py)
+    def summary(self) -> dict:
+        lead_total = float((self.lead_values * self.lead_counts).sum())
+        return {"bookings": self.total_bookings,
+                "cancellation_rate": f"{self.cancellation_rate():.2f}%",
+                "avg_lead_days": f"{lead_total / max(self.total_bookings, 1):.0f}",
+                "avg_revenue_per_booking": f"{self.average_revenue():.2f}"}
+
+    def revenue_trends(self) -> list:
+        has_bookings = self.month_booked > 0
+        return [{"arrival_date": pd.Timestamp(month), "revenue": float(revenue)}
+                for month, revenue in zip(self.month_start[has_bookings], self.month_revenue[has_bookings])]
+
+    def month_revenue_for(self, month_name, year: int) -> float:
+        if month_name not in MONTH_NAMES:
+            return 0.0
+        key = np.datetime64(f"{int(year):04d}-{MONTH_NAMES.index(month_name) + 1:02d}", 'M')
+        pos = np.searchsorted(self.month_start, key)
+        if pos < len(self.month_start) and self.month_start[pos] == key:
+            return float(self.month_revenue[pos])
+        return 0.0
+
+    def top_locations(self, n: int = 10) -> dict:
+        # country_names is already in descending order of non-canceled bookings
+        names, counts = self.country_names[:n], self.country_booked[:n]
+        return {str(name): int(count) for name, count in zip(names, counts) if count > 0}
+
+    def highest_cancellations(self) -> tuple:
+        pos = int(np.argmax(self.country_canceled))
+        return str(self.country_names[pos]), int(self.country_canceled[pos])
+
+    def lead_time_distribution(self, bins: int = 10) -> dict:
+        # pd.cut picks its edges from min/max, so cutting the distinct values gives
+        # the same intervals as cutting every row
+        categories = pd.cut(self.lead_values, bins=bins)
+        counts = pd.Series(self.lead_counts).groupby(categories, observed=False).sum()
+        return {interval: int(count) for interval, count in counts.items()}
+
+
+# Rows sorted by arrival_date, with per-dimension posting lists of row positions, so
+# a filtered report only touches rows in the date slice that match the filters.
+# With a `path` the arrays are written there (keyed on the row count and `version`)
+# and memory-mapped read-only, so workers serving one store share a single copy;
+# files for other data are rebuilt.
+class FilterIndex:
+    DIMENSIONS = ['hotel', 'country', 'market_segment', 'is_canceled']
+    COLUMNS = ['order', 'dates', 'revenue', 'canceled', 'lead_time']
+
+    def __init__(self, data: pd.DataFrame, path: str = None, version=None):
+        loaded = self._load(path, len(data), version) if path is not None else None
+        if loaded is None:
+            loaded = self._build(data)
+            if path is not None:
+                try:
+                    self._save(path, version, *loaded)
+                    loaded = self._load(path, len(data), version) or loaded
+                except OSError:
+                    pass  # read-only store: keep the private copy
+        self._attach(*loaded)
+
+    @classmethod
+    def _build(cls, data: pd.DataFrame) -> tuple:
+        order = np.argsort(data['arrival_date'].to_numpy(dtype='datetime64[ns]'), kind='stable')
+        arrays = {
+            'order': order,  # position in date order -> row id in the frame / FAISS index
+            'dates': data['arrival_date'].to_numpy(dtype='datetime64[ns]')[order],
+            'revenue': data['revenue'].to_numpy(dtype=np.float64)[order],
+            'canceled': data['is_canceled'].to_numpy(dtype=np.int8)[order],
+            'lead_time': data['lead_time'].to_numpy()[order],
+        }
+        # Category codes per dimension (in date order) and the positions of each code's
+        # rows, ascending, as one array cut by bounds
+        categories = {}
+        for name in cls.DIMENSIONS:
+            if name not in data.columns:
+                continue
+            cat = pd.Categorical(data[name].astype(str))
+            codes = cat.codes[order].astype(np.int32)
+            by_code = np.argsort(codes, kind='stable')
+            arrays[f'{name}.codes'] = codes
+            arrays[f'{name}.by_code'] = by_code
+            arrays[f'{name}.bounds'] = np.searchsorted(codes[by_code], np.arange(len(cat.categories) + 1))
+            categories[name] = [str(value) for value in cat.categories]
+        return arrays, categories
+
+    # Each array is replaced atomically and meta.json last, as in the columnar store
+    @staticmethod
+    def _save(path: str, version, arrays: dict, categories: dict):
+        os.makedirs(path, exist_ok=True)
+        for name, values in arrays.items():
+            tmp = os.path.join(path, f'{name}.tmp.npy')
+            np.save(tmp, values)
+            os.replace(tmp, os.path.join(path, f'{name}.npy'))
+        write_meta(path, {"rows": int(len(arrays['order'])), "version": version, "categories": categories})
+
+    @classmethod
+    def _load(cls, path: str, rows: int, version):
+        try:
+            meta = read_meta(path)
+            if meta['rows'] != rows or meta['version'] != version:
+                return None
+            categories = meta['categories']
+            names = cls.COLUMNS + [f'{name}.{part}' for name in categories for part in ('codes', 'by_code', 'bounds')]
+            arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in names}
+        except (OSError, ValueError, KeyError):
+            return None
+        # another process may be rewriting the files for newer data
+        if any(len(arrays[name]) != rows for name in names if not name.endswith('.bounds')):
+            return None
+        return arrays, categories
+
+    def _attach(self, arrays: dict, categories: dict):
+        for name in self.COLUMNS:
+            setattr(self, name, arrays[name])
+        self.codes = {name: arrays[f'{name}.codes'] for name in categories}
+        self.categories = {name: {value: code for code, value in enumerate(values)}
+                           for name, values in categories.items()}
+        self.postings = {}
+        for name, values in categories.items():
+            by_code, bounds = arrays[f'{name}.by_code'], arrays[f'{name}.bounds']
+            self.postings[name] = [by_code[bounds[c]:bounds[c + 1]] for c in range(len(values))]
+
+    # Sorted row positions (in date order) matching the date range (inclusive) and filters
+    def select(self, start=None, end=None, **filters) -> np.ndarray:
+        lo = np.searchsorted(self.dates, np.datetime64(start, 'ns'), 'left') if start is not None else 0
+        hi = np.searchsorted(self.dates, np.datetime64(end, 'ns'), 'right') if end is not None else len(self.dates)
+        wanted = []
+        for name, value in filters.items():
+            if value is None:
+                continue
+            code = self.categories.get(name, {}).get(str(value))
+            if code is None:
+                return np.zeros(0, dtype=np.int64)
+            posting = self.postings[name][code]
+            wanted.append((name, code, posting[np.searchsorted(posting, lo):np.searchsorted(posting, hi)]))
+        if not wanted:
+            return np.arange(lo, hi)
+
+        # Start from the most selective clipped posting list and check the rest by code
+        wanted.sort(key=lambda item: len(item[2]))
+        positions = wanted[0][2]
+        for name, code, _ in wanted[1:]:
+            positions = positions[self.codes[name][positions] == code]
+        return positions
+
+    def row_ids(self, positions) -> np.ndarray:
+        return np.sort(self.order[positions]).astype(np.int64)
+
+    def cancellation_rate(self, positions) -> float:
+        if len(positions) == 0:
+            return 0.0
+        return float(self.canceled[positions].mean() * 100)
+
+    def summary(self, positions) -> dict:
+        booked = positions[self.canceled[positions] == 0]
+        return {"bookings": int(len(positions)),
+                "cancellation_rate": f"{self.cancellation_rate(positions):.2f}%",
+                "avg_lead_days": f"{self.lead_time[positions].mean():.0f}" if len(positions) else "n/a",
+                "avg_revenue_per_booking": f"{self.revenue[booked].mean():.2f}" if len(booked) else "n/a"}
+
+    def revenue_trends(self, positions) -> list:
+        booked = positions[self.canceled[positions] == 0]
+        months, inverse = np.unique(self.dates[booked].astype('datetime64[M]'), return_inverse=True)
+        revenue = np.bincount(inverse, weights=self.revenue[booked], minlength=len(months))
+        return [{"arrival_date": pd.Timestamp(month), "revenue": float(total)}
+                for month, total in zip(months, revenue)]
+
+    def top_locations(self, positions, n: int = 10) -> dict:
+        booked = positions[self.canceled[positions] == 0]
+        counts = np.bincount(self.codes['country'][booked], minlength=len(self.categories['country']))
+        names = list(self.categories['country'])
+        top = np.argsort(-counts, kind='stable')[:n]
+        return {names[code]: int(counts[code]) for code in top if counts[code] > 0}
+
+    def lead_time_distribution(self, positions, bins: int = 10) -> dict:
+        if len(positions) == 0:
+            return {}
+        counts = pd.Series(pd.cut(self.lead_time[positions], bins=bins)).value_counts(sort=False)
+        return {interval: int(count) for interval, count in counts.items()}
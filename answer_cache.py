@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# File: answer_cache.py
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Lowercase, drop punctuation and collapse whitespace so trivially different
+# spellings of the same question share one cache entry
+def normalize_question(question: str) -> str:
+    question = question.lower().replace('’', "'")
+    question = re.sub(r"[^\w\s']", ' ', question)
+    return ' '.join(question.split())
+
+
+# Bounded LRU cache with per-entry TTL for /ask answers. clear() is called
+# whenever the dataset or index is reloaded.
+class AnswerCache:
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, question: str):
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+            return None
+
+    def put(self, question: str, value):
+        key = normalize_question(question)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self._entries), "max_size": self.max_size, "ttl": self.ttl,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+# Reuses answers for paraphrased questions: a small inner-product FAISS index over
+# the L2-normalized embeddings of questions already answered. A lookup hits when
+# the best cosine similarity reaches `threshold`. faiss is imported on first use so
+# constructing the cache stays cheap.
+class SemanticCache:
+    SIMILARITY_BINS = np.linspace(0.0, 1.0, 11)
+
+    def __init__(self, dim: int, threshold: float = 0.9, max_size: int = 1024, ttl: float = 3600.0):
+        self.dim = dim
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self._index = None
+        self._entries = OrderedDict()  # id -> (expires, value)
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._similarity_counts = np.zeros(len(self.SIMILARITY_BINS) - 1, dtype=np.int64)
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vec = np.array(embedding, dtype=np.float32).reshape(1, -1)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def _get_index(self):
+        if self._index is None:
+            import faiss
+            self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim))
+        return self._index
+
+    def _remove(self, entry_id: int):
+        del self._entries[entry_id]
+        self._index.remove_ids(np.array([entry_id], dtype=np.int64))
+
+    def get(self, embedding):
+        vec = self._normalize(embedding)
+        with self._lock:
+            if self._index is None or self._index.ntotal == 0:
+                self.misses += 1
+                return None
+            D, I = self._index.search(vec, 1)
+            similarity, entry_id = float(D[0][0]), int(I[0][0])
+            pos = np.searchsorted(self.SIMILARITY_BINS, min(max(similarity, 0.0), 1.0), side='right') - 1
+            self._similarity_counts[min(pos, len(self._similarity_counts) - 1)] += 1
+            if similarity >= self.threshold and entry_id in self._entries:
+                expires, value = self._entries[entry_id]
+                if expires >= time.monotonic():
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return value
+                self._remove(entry_id)
+            self.misses += 1
+            return None
+
+    def put(self, embedding, value):
+        vec = self._normalize(embedding)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._get_index().add_with_ids(vec, np.array([entry_id], dtype=np.int64))
+            self._entries[entry_id] = (time.monotonic() + self.ttl, value)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            if self._index is not None:
+                self._index.reset()
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            bins = self.SIMILARITY_BINS
+            return {"size": len(self._entries), "max_size": self.max_size, "threshold": self.threshold,
+                    "hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "similarity_distribution": {f"{lo:.1f}-{hi:.1f}": int(count) for lo, hi, count
+                                                in zip(bins[:-1], bins[1:], self._similarity_counts)}}
@@ -5,149 +5,449 @@
 
 
 # File: api.py
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import pandas as pd
-import faiss
-import google.generativeai as genai
-from sentence_transformers import SentenceTransformer
-import re
+import asyncio
+import json
 import os
+import time
+from datetime import date
+from typing import List, Optional
+from contextlib import ExitStack, asynccontextmanager
+from booking_engine import (FILTER_FIELDS, INDEX_PATH, K, NO_ANSWER, BookingEngine, batch_result, is_empty_scope,
+                            no_match_answer)
+from columnar_store import STORE_PATH, store_version
+from context_builder import estimate_tokens
+from llm_client import LLMUnavailable, retrieval_only_answer
+from answer_cache import AnswerCache, SemanticCache, normalize_question
+from retrieval_batcher import RetrievalBatcher
+from single_flight import SingleFlight
+from bounded_executor import AdmissionLimit, BoundedExecutor, Overloaded
+from metrics import Metrics, request_timings, resident_bytes, request_values, server_timing, value_headers
 
-# Configure Gemini API
-genai.configure(api_key=os.getenv("GEMINI_API_KEY", "your_gemini_key"))  # Replace with your key
-gemini_model = genai.GenerativeModel('gemini-2.0-flash')
+# Per-stage latency histograms, exposed on /metrics
+metrics = Metrics()
+TIMING_HEADER = os.getenv("TIMING_HEADER", "0") == "1"  # always send Server-Timing
 
-# Load data and FAISS index
-data = pd.read_csv('hotel_bookings_with_embeddings.csv')
-data['arrival_date'] = pd.to_datetime(data['arrival_date'])
-index = faiss.read_index('hotel_booking_index.faiss')
+# Startup: data and analytics load before serving; the index, embedding model and
+# Gemini client are preloaded and warmed up (in the background by default).
+# ANALYTICS_ONLY=1 skips them, and anything skipped is loaded on first use.
+ANALYTICS_ONLY = os.getenv("ANALYTICS_ONLY", "0") == "1"
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "1") == "1" and not ANALYTICS_ONLY
+PRELOAD_BACKGROUND = os.getenv("PRELOAD_BACKGROUND", "1") == "1"
+# API_SHARED=1 (set by serve.py): several workers attach to the same memory-mapped store
+# and index instead of each holding private copies, and pick up new files by polling
+SHARED_MODE = os.getenv("API_SHARED", "0") == "1"
+SHARED_RELOAD_INTERVAL = float(os.getenv("SHARED_RELOAD_INTERVAL", "5"))
+
+# Data, analytics, index, embedding model and LLM client live in the shared engine
+# (see booking_engine.py). LLM calls go through a client with deadlines, retries, a
+# concurrency cap and a circuit breaker; when the LLM is unavailable /ask falls back
+# to a retrieval-only answer.
+engine = BookingEngine(shared=SHARED_MODE, analytics_only=ANALYTICS_ONLY, metrics=metrics)
+readiness = engine.readiness
+llm = engine.llm
+
+# Cache of RAG answers keyed on normalized question text
+answer_cache = AnswerCache(max_size=int(os.getenv("ASK_CACHE_SIZE", "1024")),
+                           ttl=float(os.getenv("ASK_CACHE_TTL", "3600")))
+# Cache of RAG answers keyed on question embedding, for paraphrased questions
+semantic_cache = SemanticCache(dim=384,  # all-MiniLM-L6-v2 embedding size
+                               threshold=float(os.getenv("ASK_SEMANTIC_THRESHOLD", "0.9")),
+                               max_size=int(os.getenv("ASK_CACHE_SIZE", "1024")),
+                               ttl=float(os.getenv("ASK_CACHE_TTL", "3600")))
+
+# Blocking pandas/FAISS work runs on a bounded pool; requests beyond the limits get a 429
+cpu_pool = BoundedExecutor(max_workers=int(os.getenv("API_WORKER_THREADS", "4")),
+                           max_pending=int(os.getenv("API_MAX_PENDING", "64")))
+ask_limit = AdmissionLimit(max_in_flight=int(os.getenv("ASK_MAX_IN_FLIGHT", "128")))
+
+# Identical concurrent /analytics and /ask requests share one computation
+# (COALESCE_REQUESTS=0 turns this off)
+COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "1") == "1"
+analytics_flight = SingleFlight()
+ask_flight = SingleFlight()
+
+# /ask/batch: questions per request, and LLM calls in flight per batch
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "1000"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", str(llm.concurrency)))
+
+async def coalesced(flight, key, fn):
+    return await flight.run(key, fn) if COALESCE_REQUESTS else await fn()
+
+# Cached answers were built from the old data/index
+def clear_caches():
+    answer_cache.clear()
+    semantic_cache.clear()
+
+engine.on_change.append(clear_caches)
+
+def load_data():
+    engine.load()
+
+def artifact_version():
+    try:
+        index_mtime = os.stat(INDEX_PATH).st_mtime_ns
+    except FileNotFoundError:
+        index_mtime = None
+    return store_version(STORE_PATH), index_mtime
+
+# Shared mode: reload when ingest.py (or a rebuild) replaces the store or index files
+async def watch_artifacts():
+    loop = asyncio.get_running_loop()
+    version = artifact_version()
+    while True:
+        await asyncio.sleep(SHARED_RELOAD_INTERVAL)
+        current = artifact_version()
+        if current != version and None not in current:  # store mid-swap looks missing; wait
+            try:
+                await loop.run_in_executor(None, load_data)
+                version = current
+            except Exception as e:
+                readiness["data"] = f"error: {str(e)}"
+
+@asynccontextmanager
+async def lifespan(app):
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, load_data)
+    if PRELOAD_MODELS:
+        warm = loop.run_in_executor(None, engine.warm_up)
+        if not PRELOAD_BACKGROUND:
+            await warm
+    watcher = asyncio.create_task(watch_artifacts()) if SHARED_MODE else None
+    yield
+    if watcher is not None:
+        watcher.cancel()
 
 # Initialize FastAPI app
-app = FastAPI(title="Hotel Booking Analytics API")
+app = FastAPI(title="Hotel Booking Analytics API", lifespan=lifespan)
 
 # Pydantic models for request bodies
 class AnalyticsRequest(BaseModel):
     report_type: str  # e.g., "revenue_trends", "cancellation_rate"
+    # Optional filters; arrival dates are inclusive
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    hotel: Optional[str] = None  # "Resort Hotel" / "City Hotel"
+    country: Optional[str] = None  # ISO 3166 alpha-3, e.g. "PRT"
+    market_segment: Optional[str] = None
+    is_canceled: Optional[int] = None  # 0 or 1
+    bins: int = 10  # lead_time_distribution only
 
 class AskRequest(BaseModel):
     question: str
+    # Optional retrieval filters; they override filters named in the question
+    country: Optional[str] = None
+    hotel: Optional[str] = None
+    year: Optional[int] = None
+    is_canceled: Optional[int] = None
 
-# Lazy-load SentenceTransformer model
-def get_model():
-    if not hasattr(get_model, 'model'):
-        get_model.model = SentenceTransformer('all-MiniLM-L6-v2')
-    return get_model.model
-
-# Analytics logic
-def generate_analytics(report_type: str):
-    report_type = report_type.lower()
-    if report_type == "revenue_trends":
-        revenue_trends = data[data['is_canceled'] == 0].groupby(
-            data['arrival_date'].dt.to_period('M')
-        )['revenue'].sum().reset_index()
-        revenue_trends['arrival_date'] = revenue_trends['arrival_date'].dt.to_timestamp()
-        return {"revenue_trends": revenue_trends.to_dict(orient='records')}
-
-    elif report_type == "cancellation_rate":
-        cancellation_rate = data['is_canceled'].mean() * 100
-        return {"cancellation_rate": f"{cancellation_rate:.2f}%"}
-
-    elif report_type == "top_locations":
-        geo_distribution = data[data['is_canceled'] == 0]['country'].value_counts().head(10)
-        return {"top_locations": geo_distribution.to_dict()}
-
-    elif report_type == "lead_time_distribution":
-        lead_time_bins = pd.cut(data['lead_time'], bins=10).value_counts().sort_index()
-        return {"lead_time_distribution": lead_time_bins.to_dict()}
-
-    else:
-        raise HTTPException(status_code=400, detail="Invalid report type. Options: revenue_trends, cancellation_rate, top_locations, lead_time_distribution")
-
-# Q&A logic
-def ask_gemini(query, context_data):
-    prompt = f"""
-    You are a hotel booking analytics assistant. Use the provided data to answer the query.
-    Insights available: revenue trends, cancellation rates, lead time, booking locations.
-
-    User Query: {query}
-    Relevant Data: {context_data}
-
-    Provide a clear and concise response.
-    """
-    try:
-        response = gemini_model.generate_content(prompt)
-        return response.text.strip() if response and response.text else "No relevant information found."
-    except Exception as e:
-        return f"Error: {str(e)}"
-
-def handle_analytics_query(query):
-    query_lower = query.lower()
-    month_map = {
-        'january': 'January', 'february': 'February', 'march': 'March', 'april': 'April',
-        'may': 'May', 'june': 'June', 'july': 'July', 'august': 'August', 'september': 'September',
-        'october': 'October', 'november': 'November', 'december': 'December'
-    }
+    def filters(self) -> dict:
+        return {name: getattr(self, name) for name in ('country', 'hotel', 'year', 'is_canceled')
+                if getattr(self, name) is not None}
+
+class BatchAskRequest(BaseModel):
+    questions: List[AskRequest]
+
+class IngestRequest(BaseModel):
+    rows: List[dict]  # raw booking rows, same columns as hotel_bookings.csv
+
+# Encode + FAISS search for concurrent /ask requests, batched into one matrix call.
+# The engine looks the index up at call time, so /reload takes effect immediately.
+# This runs on the batcher thread, so encode/search only feed the histograms.
+retrieval_batcher = RetrievalBatcher(encode=engine.encode,
+                                     search=engine.search,
+                                     k=K,
+                                     max_batch_size=int(os.getenv("RETRIEVAL_BATCH_SIZE", "32")),
+                                     max_wait=float(os.getenv("RETRIEVAL_BATCH_WAIT", "0.005")))
+
+# Raises LLMUnavailable when the client gives up
+async def ask_gemini(query, context_data):
+    prompt = engine.prompt(query, context_data)
+    engine.load_llm()
+    with metrics.span("llm"):
+        answer = await llm.generate(prompt)
+    return answer.strip() or NO_ANSWER
 
-    if "total revenue" in query_lower:
-        match = re.search(r'(\w+)\s(\d{4})', query)
-        if match:
-            month, year = match.groups()
-            month_name = month_map.get(month.lower())
-            filtered_data = data[(data['arrival_date_month'] == month_name) & 
-                                (data['arrival_date_year'] == int(year)) & 
-                                (data['is_canceled'] == 0)]
-            total_revenue = filtered_data['revenue'].sum()
-            return {"Total Revenue": f"${total_revenue:.2f}", "Month": month_name, "Year": year}
-
-    elif "cancellation rate" in query_lower:
-        cancellation_rate = data['is_canceled'].mean() * 100
-        return {"Cancellation Rate": f"{cancellation_rate:.2f}%"}
-
-    elif "highest booking cancellations" in query_lower:
-        canceled_bookings = data[data['is_canceled'] == 1]
-        highest_cancellations = canceled_bookings['country'].value_counts().idxmax()
-        cancel_count = canceled_bookings['country'].value_counts().max()
-        return {"Location with Highest Cancellations": highest_cancellations, "Total Cancellations": int(cancel_count)}
-
-    elif "average price" in query_lower:
-        avg_price = data[data['is_canceled'] == 0]['revenue'].mean()
-        return {"Average Revenue per Booking": f"${avg_price:.2f}"}
-
-    return None
-
-def ask_question(query):
+def cache_key(query, overrides):
+    return query if not overrides else f"{query} {sorted(overrides.items())}"
+
+async def ask_question(query, overrides=None):
+    overrides = overrides or {}
     # Try analytics query first
-    analytics_response = handle_analytics_query(query)
+    with metrics.span("analytics_query"):
+        analytics_response = await cpu_pool.run(engine.answer_structured, query) if not overrides else None
     if analytics_response is not None:
         return analytics_response
 
-    # Use RAG
-    model = get_model()
-    query_embedding = model.encode([query]).astype('float32')
-    D, I = index.search(query_embedding, 5)
-    context_data = "\n".join(data.iloc[I[0]]['text'].tolist())
-    return {"answer": ask_gemini(query, context_data)}
+    key = cache_key(query, overrides)
+    with metrics.span("answer_cache"):
+        cached = answer_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # Use RAG (embedding and FAISS search are batched with other in-flight questions),
+    # restricted to rows matching the question's/request's filters (selected on the pool)
+    ids, filters, summary = await cpu_pool.run(engine.retrieval_scope, query, overrides)
+    if is_empty_scope(ids):
+        return no_match_answer(filters)
+    with metrics.span("retrieval"):
+        query_embedding, D, I = await asyncio.wrap_future(retrieval_batcher.submit(query, ids))
+    # Paraphrase matching can't tell filters apart, so only questions without filters use it
+    with metrics.span("semantic_cache"):
+        similar = semantic_cache.get(query_embedding[0]) if not filters else None
+    if similar is not None:
+        answer_cache.put(key, similar)
+        return similar
+
+    with metrics.span("context"):
+        context_data = await cpu_pool.run(engine.build_context, I[0], filters, summary)
+    try:
+        response = {"answer": await ask_gemini(query, context_data)}
+    except LLMUnavailable:
+        return retrieval_only_answer(context_data)  # degraded: not cached
+    answer_cache.put(key, response)
+    if not filters:
+        semantic_cache.put(query_embedding[0], response)
+    return response
+
+# Bulk variant of ask_question: cached answers are looked up first, the rest are
+# prepared together by the engine (one structured pass, one encode, batched FAISS
+# searches, shared row reads) and the LLM calls run with bounded parallelism.
+# Results come back in input order with per-stage timings.
+async def ask_batch(items):
+    results = [None] * len(items)
+    misses = []
+    for position, (query, overrides) in enumerate(items):
+        cached = answer_cache.get(cache_key(query, overrides))
+        if cached is not None:
+            results[position] = batch_result(query, {}, cached, "cache")
+        else:
+            misses.append(position)
+
+    prepared = await cpu_pool.run(engine.prepare_batch, [items[position] for position in misses]) if misses else []
+    slots = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+
+    async def generate(query, overrides, entry):
+        async with slots:
+            start = time.perf_counter()
+            try:
+                response, source = {"answer": await ask_gemini(query, entry["context"])}, "rag"
+                answer_cache.put(cache_key(query, overrides), response)
+            except LLMUnavailable:
+                response, source = retrieval_only_answer(entry["context"]), "degraded"  # not cached
+            return response, source, time.perf_counter() - start
+
+    calls = {}
+    for position, entry in zip(misses, prepared):
+        if "context" in entry and id(entry) not in calls:
+            calls[id(entry)] = asyncio.ensure_future(generate(*items[position], entry))
+    if calls:
+        await asyncio.gather(*calls.values())
+    for position, entry in zip(misses, prepared):
+        query = items[position][0]
+        if "context" in entry:
+            results[position] = batch_result(query, entry, *calls[id(entry)].result())
+        else:
+            results[position] = batch_result(query, entry, entry["answer"], entry.get("source", "structured"))
+    return results
+
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+# Streaming variant of ask_question: structured/cached answers are sent as a single
+# "answer" event; otherwise the retrieved row ids go out first as "context", then
+# Gemini's output as "token" events and the full text (with the prompt size) as "done".
+# If the LLM is unavailable before the first token, a retrieval-only "answer" is sent.
+# The ask_limit slot is taken here rather than in the endpoint, so it is only held
+# while the stream runs: a client that leaves before the body starts holds none.
+async def stream_answer(query, overrides=None):
+    overrides = overrides or {}
+    key = cache_key(query, overrides)
+    admission = ExitStack()
+    try:
+        admission.enter_context(ask_limit.slot())
+        analytics_response = await cpu_pool.run(engine.answer_structured, query) if not overrides else None
+        if analytics_response is None:
+            analytics_response = answer_cache.get(key)
+        if analytics_response is not None:
+            yield sse_event("answer", analytics_response)
+            return
+
+        ids, filters, summary = await cpu_pool.run(engine.retrieval_scope, query, overrides)
+        if is_empty_scope(ids):
+            yield sse_event("answer", no_match_answer(filters))
+            return
+        with metrics.span("retrieval"):
+            query_embedding, D, I = await asyncio.wrap_future(retrieval_batcher.submit(query, ids))
+        yield sse_event("context", {"ids": [int(i) for i in I[0] if i >= 0]})
+        similar = semantic_cache.get(query_embedding[0]) if not filters else None
+        if similar is not None:
+            answer_cache.put(key, similar)
+            yield sse_event("answer", similar)
+            return
+
+        with metrics.span("context"):
+            context_data = await cpu_pool.run(engine.build_context, I[0], filters, summary)
+        prompt = engine.prompt(query, context_data)
+        engine.load_llm()
+        chunks = []
+        start = time.perf_counter()
+        try:
+            async for chunk in llm.stream(prompt):
+                if not chunks:
+                    metrics.observe("stage_seconds", time.perf_counter() - start, stage="llm_first_token")
+                chunks.append(chunk)
+                yield sse_event("token", {"text": chunk})
+        except LLMUnavailable:
+            if chunks:
+                raise
+            yield sse_event("answer", retrieval_only_answer(context_data))
+            return
+        answer = "".join(chunks).strip() or NO_ANSWER
+        answer_cache.put(key, {"answer": answer})
+        if not filters:
+            semantic_cache.put(query_embedding[0], {"answer": answer})
+        yield sse_event("done", {"answer": answer, "prompt_tokens": estimate_tokens(prompt)})
+    except Exception as e:
+        yield sse_event("error", {"detail": f"Error answering question: {str(e)}"})
+    finally:
+        admission.close()
 
 # API Endpoints
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    # Send a Server-Timing header with per-stage durations when TIMING_HEADER=1 or
+    # the client asks for it with an X-Debug-Timing header
+    timings, values = {}, {}
+    token, values_token = request_timings.set(timings), request_values.set(values)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        request_timings.reset(token)
+        request_values.reset(values_token)
+    elapsed = time.perf_counter() - start
+    metrics.observe("request_seconds", elapsed, path=request.url.path)
+    if TIMING_HEADER or "x-debug-timing" in request.headers:
+        response.headers["Server-Timing"] = server_timing({**timings, "total": elapsed})
+    response.headers.update(value_headers(values))  # e.g. X-Prompt-Tokens for /ask
+    return response
+
 @app.post("/analytics")
 async def get_analytics(request: AnalyticsRequest):
     try:
-        report = generate_analytics(request.report_type)
+        with metrics.span("analytics_report"):
+            filters = {name: getattr(request, name) for name in FILTER_FIELDS}
+            key = (request.report_type.lower(), tuple(sorted(filters.items())), request.bins)
+            report = await coalesced(analytics_flight, key,
+                                     lambda: cpu_pool.run(engine.analytics, request.report_type, filters,
+                                                          request.bins))
         return report
-    except HTTPException as e:
-        raise e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Overloaded as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating analytics: {str(e)}")
 
+@app.post("/reload")
+async def reload_data():
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, load_data)
+        return {"status": "reloaded", "rows": len(engine.data)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reloading data: {str(e)}")
+
+@app.post("/ingest")
+async def ingest(request: IngestRequest):
+    if SHARED_MODE:
+        raise HTTPException(status_code=409, detail="Ingest through ingest.py in shared mode; "
+                                                    "workers reload the updated files automatically")
+    try:
+        added = await asyncio.get_running_loop().run_in_executor(None, engine.ingest, pd.DataFrame(request.rows))
+        return {"status": "ingested", "added": added, "rows": len(engine.data)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error ingesting rows: {str(e)}")
+
+@app.get("/ready")
+async def ready():
+    required = ["data"] if ANALYTICS_ONLY else list(readiness)
+    is_ready = all(readiness[name] == "ready" for name in required)
+    return JSONResponse(status_code=200 if is_ready else 503,
+                        content={"ready": is_ready, "analytics_only": ANALYTICS_ONLY, "components": readiness})
+
+@app.get("/cache_stats")
+async def cache_stats():
+    return {"exact": answer_cache.stats(), "semantic": semantic_cache.stats(),
+            "coalescing": {"analytics": analytics_flight.stats(), "ask": ask_flight.stats()}}
+
+@app.get("/metrics")
+async def get_metrics():
+    exact, semantic, batches = answer_cache.stats(), semantic_cache.stats(), retrieval_batcher.stats()
+    llm_stats = llm.stats()
+    flights = {"analytics": analytics_flight.stats(), "ask": ask_flight.stats()}
+    gauges = {
+        "cache_hit_ratio": {(("cache", "exact"),): exact["hit_rate"], (("cache", "semantic"),): semantic["hit_rate"]},
+        "cache_entries": {(("cache", "exact"),): exact["size"], (("cache", "semantic"),): semantic["size"]},
+        "ask_in_flight": ask_limit.in_flight,
+        "ask_rejected_total": ask_limit.rejected,
+        "worker_pool_in_flight": cpu_pool.stats()["in_flight"],
+        "worker_pool_rejected_total": cpu_pool.stats()["rejected"],
+        "retrieval_avg_batch_size": batches["avg_batch_size"],
+        "model_load_seconds": engine.model_load_seconds,
+        "rows": len(engine.data) if engine.data is not None else 0,
+        "resident_memory_bytes": resident_bytes(),
+        "frame_memory_bytes": engine.memory.get("frame_bytes", 0),
+        "component_ready": {(("component", name),): int(state == "ready") for name, state in readiness.items()},
+        "llm_circuit_open": int(llm_stats["breaker"] != "closed"),
+        "coalesced_requests_total": {(("endpoint", name),): stats["coalesced"] for name, stats in flights.items()},
+        "coalesce_leaders_total": {(("endpoint", name),): stats["leaders"] for name, stats in flights.items()},
+        "coalesce_in_flight": {(("endpoint", name),): stats["in_flight"] for name, stats in flights.items()},
+        **{f"llm_{name}_total": llm_stats[name] for name in ("calls", "retries", "timeouts", "failures", "rejected")},
+    }
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
+
 @app.post("/ask")
 async def answer_question(request: AskRequest):
     try:
-        response = ask_question(request.question)
+        with ask_limit.slot():
+            overrides = request.filters()
+            key = normalize_question(cache_key(request.question, overrides))
+            response = await coalesced(ask_flight, key, lambda: ask_question(request.question, overrides))
         return response
+    except Overloaded as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error answering question: {str(e)}")
 
+@app.post("/ask/batch")
+async def answer_batch(request: BatchAskRequest):
+    if len(request.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch")
+    try:
+        with ask_limit.slot():
+            start = time.perf_counter()
+            results = await ask_batch([(item.question, item.filters()) for item in request.questions])
+        return {"results": results, "elapsed": time.perf_counter() - start}
+    except Overloaded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error answering questions: {str(e)}")
+
+@app.post("/ask/stream")
+async def answer_question_stream(request: AskRequest):
+    # Capacity is checked before the response starts so overload is still a 429;
+    # stream_answer takes the slot itself
+    try:
+        ask_limit.check()
+    except Overloaded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return StreamingResponse(stream_answer(request.question, request.filters()), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
 # Run the app
 if __name__ == "__main__":
     import uvicorn
@@ -6,22 +6,42 @@
 
 # File: app.py
 import streamlit as st
-import pandas as pd
-import faiss
-import re
-import google.generativeai as genai
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
-
-# Configure Gemini API (use environment variable or Streamlit secrets)
-genai.configure(api_key=os.getenv("GEMINI_API_KEY", "your_api_key"))  # Replace with your key
-gemini_model = genai.GenerativeModel('gemini-2.0-flash')
-
-# Load data and FAISS index (no model yet)
-data = pd.read_csv('hotel_bookings_with_embeddings.csv')
-data['arrival_date'] = pd.to_datetime(data['arrival_date']) 
-index = faiss.read_index('hotel_booking_index.faiss')
+from booking_engine import BookingEngine, RemoteEngine
+from charts import CHARTS
+
+# Data, analytics, retrieval and LLM calls come from the same engine the API uses
+# (see booking_engine.py). Set API_URL to use a running API instead of loading
+# everything in this process. Set GEMINI_API_KEY, or LLM_BACKEND=stub to run offline.
+API_URL = os.getenv("API_URL")
+REPORT_TTL = float(os.getenv("REPORT_TTL", "300"))  # seconds a report is reused across reruns
+
+# Loaded once per process and shared by every session and rerun (the embedding model
+# and LLM client load on first use)
+@st.cache_resource
+def get_engine():
+    return RemoteEngine(API_URL) if API_URL else BookingEngine().load()
+
+engine = get_engine()
+
+# Reports and rendered charts are keyed on the engine's data version, so an ingest or
+# reload invalidates them at once; the TTL covers changes made behind a remote API
+@st.cache_data(ttl=REPORT_TTL, show_spinner=False)
+def get_report(report_type, data_version=0, bins=10):
+    return engine.analytics(report_type, bins=bins)[report_type]
+
+def report(report_type):
+    return get_report(report_type, engine.data_version)
+
+# PNG bytes rendered once per chart and data version and shared by every session, so
+# reruns and concurrent viewers only send the image
+@st.cache_data(ttl=REPORT_TTL, show_spinner=False, max_entries=32)
+def render_chart(name, data_version=0):
+    report_type, bins, render = CHARTS[name]
+    return render(get_report(report_type, data_version, bins))
+
+def show_chart(name):
+    st.image(render_chart(name, engine.data_version))
 
 # Streamlit App Title
 st.title("🏨 Hotel Booking Analytics & Q&A System")
@@ -29,144 +49,63 @@ st.title("🏨 Hotel Booking Analytics & Q&A System")
 # Sidebar Navigation
 option = st.sidebar.selectbox("Choose an option:", ["Analytics", "Ask a Question"])
 
+# Charts shared by the analytics page and chart questions
+def plot_revenue_trends():
+    show_chart("revenue_trends")
+
+def plot_top_locations():
+    show_chart("top_locations")
+
+def plot_lead_time_distribution():
+    show_chart("lead_time_distribution")
+
 # Function to display analytics
 def display_analytics():
     st.header("📊 Booking Analytics")
 
     # Revenue Trends
     st.subheader("💰 Revenue Trends Over Time")
-    revenue_trends = data[data['is_canceled'] == 0].groupby(
-        data['arrival_date'].dt.to_period('M')
-    )['revenue'].sum().reset_index()
-    revenue_trends['arrival_date'] = revenue_trends['arrival_date'].dt.to_timestamp()
-    fig, ax = plt.subplots(figsize=(10, 6))
-    sns.lineplot(x='arrival_date', y='revenue', data=revenue_trends, ax=ax)
-    ax.set_title('Revenue Trends Over Time')
-    ax.set_xlabel('Date')
-    ax.set_ylabel('Total Revenue ($)')
-    st.pyplot(fig)
+    plot_revenue_trends()
 
     # Cancellation Rate
     st.subheader("❌ Cancellation Rate")
-    cancellation_rate = data['is_canceled'].mean() * 100
-    st.write(f"{cancellation_rate:.2f}% of total bookings were canceled.")
+    st.write(f"{report('cancellation_rate')} of total bookings were canceled.")
 
     # Geographical Distribution
     st.subheader("🌍 Top 10 Booking Locations")
-    geo_distribution = data[data['is_canceled'] == 0]['country'].value_counts().head(10)
-    fig, ax = plt.subplots(figsize=(10, 6))
-    geo_distribution.plot(kind='bar', ax=ax, color='skyblue')
-    ax.set_title('Top 10 Booking Countries')
-    ax.set_xlabel('Country')
-    ax.set_ylabel('Number of Bookings')
-    st.pyplot(fig)
+    plot_top_locations()
 
     # Lead Time Distribution
     st.subheader("⏳ Booking Lead Time Distribution")
-    fig, ax = plt.subplots(figsize=(10, 6))
-    sns.histplot(data['lead_time'], bins=50, kde=True, ax=ax, color='orange')
-    ax.set_title('Booking Lead Time Distribution')
-    ax.set_xlabel('Lead Time (days)')
-    ax.set_ylabel('Frequency')
-    st.pyplot(fig)
-
-# Function to generate responses using Gemini
-def ask_gemini(query, context_data):
-    prompt = f"""
-    You are a hotel booking analytics assistant. Use the provided data to answer the query.
-    Insights available: revenue trends, cancellation rates, lead time, booking locations.
-
-    User Query: {query}
-    Relevant Data: {context_data}
-
-    Provide a clear and concise response.
-    """
-    try:
-        response = gemini_model.generate_content(prompt)
-        return response.text.strip() if response and response.text else "No relevant information found."
-    except Exception as e:
-        return f"Error: {str(e)}"
-
-# Function to handle analytics queries with pandas
-def handle_analytics_query(query):
+    plot_lead_time_distribution()
+
+# Function to handle chart questions; returns True if a chart was shown
+def handle_chart_query(query):
     query_lower = query.lower()
-    month_map = {
-        'january': 'January', 'february': 'February', 'march': 'March', 'april': 'April',
-        'may': 'May', 'june': 'June', 'july': 'July', 'august': 'August', 'september': 'September',
-        'october': 'October', 'november': 'November', 'december': 'December'
-    }
-
-    if "total revenue" in query_lower:
-        match = re.search(r'(\w+)\s(\d{4})', query)
-        if match:
-            month, year = match.groups()
-            month_name = month_map.get(month.lower())
-            filtered_data = data[(data['arrival_date_month'] == month_name) & 
-                                (data['arrival_date_year'] == int(year)) & 
-                                (data['is_canceled'] == 0)]
-            total_revenue = filtered_data['revenue'].sum()
-            return {"Total Revenue": f"${total_revenue:.2f}", "Month": month_name, "Year": year}
-
-    elif "cancellation rate" in query_lower:
-        cancellation_rate = data['is_canceled'].mean() * 100
-        return {"Cancellation Rate": f"{cancellation_rate:.2f}%"}
-
-    elif "highest booking cancellations" in query_lower:
-        canceled_bookings = data[data['is_canceled'] == 1]
-        highest_cancellations = canceled_bookings['country'].value_counts().idxmax()
-        cancel_count = canceled_bookings['country'].value_counts().max()
-        return {"Location with Highest Cancellations": highest_cancellations, "Total Cancellations": int(cancel_count)}
-
-    elif "revenue trends" in query_lower:
+
+    if "revenue trends" in query_lower:
         st.subheader("💰 Revenue Trends Over Time")
-        revenue_trends = data[data['is_canceled'] == 0].groupby(
-            data['arrival_date'].dt.to_period('M')
-        )['revenue'].sum().reset_index()
-        revenue_trends['arrival_date'] = revenue_trends['arrival_date'].dt.to_timestamp()
-        fig, ax = plt.subplots(figsize=(10, 6))
-        sns.lineplot(x='arrival_date', y='revenue', data=revenue_trends, ax=ax)
-        st.pyplot(fig)
-        return None
+        plot_revenue_trends()
+        return True
 
     elif "geographical distribution" in query_lower:
         st.subheader("🌍 Top 10 Booking Locations")
-        geo_distribution = data[data['is_canceled'] == 0]['country'].value_counts().head(10)
-        fig, ax = plt.subplots(figsize=(10, 6))
-        geo_distribution.plot(kind='bar', ax=ax, color='skyblue')
-        st.pyplot(fig)
-        return None
+        plot_top_locations()
+        return True
 
     elif "lead time distribution" in query_lower:
         st.subheader("⏳ Booking Lead Time Distribution")
-        fig, ax = plt.subplots(figsize=(10, 6))
-        sns.histplot(data['lead_time'], bins=50, kde=True, ax=ax, color='orange')
-        st.pyplot(fig)
-        return None
+        plot_lead_time_distribution()
+        return True
 
-    elif "average price" in query_lower:
-        avg_price = data[data['is_canceled'] == 0]['revenue'].mean()
-        return {"Average Revenue per Booking": f"${avg_price:.2f}"}
+    return False
 
-    return None
-
-# Function to answer questions
+# Function to answer questions: charts, then the engine (structured answer from the
+# cube, or retrieval + streamed LLM answer)
 def ask_question(query):
-    # Try analytics query first
-    analytics_response = handle_analytics_query(query)
-    if analytics_response is not None:  # Handle both dict and None
-        return analytics_response
-
-    # Lazy-load sentence_transformers for RAG
-    if not hasattr(st.session_state, 'model'):
-        from sentence_transformers import SentenceTransformer
-        st.session_state.model = SentenceTransformer('all-MiniLM-L6-v2')
-    model = st.session_state.model
-
-    # Use FAISS for retrieval
-    query_embedding = model.encode([query]).astype('float32')
-    D, I = index.search(query_embedding, 5)
-    context_data = "\n".join(data.iloc[I[0]]['text'].tolist())
-    return {"Answer": ask_gemini(query, context_data)}
+    if handle_chart_query(query):
+        return None
+    return engine.ask_stream(query)
 
 # App Logic
 if option == "Analytics":
@@ -189,7 +128,12 @@ elif option == "Ask a Question":
     if st.button("Ask"):
         if query:
             response = ask_question(query)
-            if response:  
+            if response and "Context IDs" in response:
+                # RAG answer: show the retrieved rows right away, then stream the tokens
+                st.subheader("🔍 Answer:")
+                st.caption(f"Retrieved bookings: {response['Context IDs']}")
+                st.write_stream(response["Answer"])
+            elif response:
                 st.subheader("🔍 Answer:")
                 st.json(response)
             else:
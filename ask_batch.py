@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# File: ask_batch.py
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+from typing import Callable, Dict, List
+
+BASE_URL = "http://127.0.0.1:8000/ask/batch"
+FILTER_NAMES = ('country', 'hotel', 'year', 'is_canceled')
+
+
+# Questions from a text file (one per line) or JSONL ({"question", optional filters});
+# "-" reads stdin
+def read_questions(path: str) -> List[Dict]:
+    lines = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    with lines:
+        items = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            items.append(json.loads(line) if line.startswith('{') else {"question": line})
+    return items
+
+
+# Batch of {"question", filters...} -> results in order, over HTTP or in-process
+def api_client(url: str, timeout: float) -> Callable:
+    import requests
+    session = requests.Session()
+
+    def ask(batch: List[Dict]) -> List[Dict]:
+        response = session.post(url, json={"questions": batch}, timeout=timeout)
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text}")
+        return response.json()["results"]
+    return ask
+
+
+def engine_client(concurrency: int = None) -> Callable:
+    from booking_engine import BookingEngine
+    engine = BookingEngine().load()
+
+    def ask(batch: List[Dict]) -> List[Dict]:
+        items = [(item["question"], {name: item[name] for name in FILTER_NAMES if item.get(name) is not None})
+                 for item in batch]
+        return engine.ask_batch(items, concurrency)
+    return ask
+
+
+def run_batches(ask: Callable, items: List[Dict], batch_size: int) -> List[Dict]:
+    results = []
+    for start in range(0, len(items), batch_size):
+        results.extend(ask(items[start:start + batch_size]))
+        print(f"Answered {len(results)}/{len(items)} questions", file=sys.stderr)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer many questions through the batch Q&A path")
+    parser.add_argument('questions', help="text file with one question per line, or JSONL; - for stdin")
+    parser.add_argument('--mode', choices=['api', 'inprocess'], default='api',
+                        help="post to a running API's /ask/batch, or call the booking engine in this process")
+    parser.add_argument('--url', default=BASE_URL)
+    parser.add_argument('--batch-size', type=int, default=200, help="questions per batch")
+    parser.add_argument('--concurrency', type=int, help="LLM calls in flight (inprocess mode)")
+    parser.add_argument('--timeout', type=float, default=600.0)
+    parser.add_argument('--output', help="write one JSON result per line (default: stdout)")
+    args = parser.parse_args()
+
+    items = read_questions(args.questions)
+    ask = api_client(args.url, args.timeout) if args.mode == 'api' else engine_client(args.concurrency)
+    start = time.perf_counter()
+    results = run_batches(ask, items, args.batch_size)
+    elapsed = time.perf_counter() - start
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    for result in results:
+        out.write(json.dumps(result, default=str) + "\n")
+    if args.output:
+        out.close()
+    sources = Counter(result["source"] for result in results)
+    print(f"Answered {len(results)} questions in {elapsed:.1f}s "
+          f"({len(results) / elapsed if elapsed else 0:.1f} questions/s): "
+          + ", ".join(f"{source}={count}" for source, count in sorted(sources.items())), file=sys.stderr)
+    sys.exit(1 if sources.get("degraded") else 0)
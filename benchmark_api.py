@@ -5,13 +5,20 @@
 
 
 # File: benchmark_api.py
-import requests
+import argparse
+import asyncio
+import json
 import time
-from statistics import mean, stdev
+import uuid
+from contextlib import contextmanager
+
+import httpx
+import numpy as np
 
 # API endpoints
-ANALYTICS_URL = "http://127.0.0.1:8000/analytics"
-ASK_URL = "http://127.0.0.1:8000/ask"
+BASE_URL = "http://127.0.0.1:8000"
+ANALYTICS_PATH = "/analytics"
+ASK_PATH = "/ask"
 
 # Test cases
 ANALYTICS_TESTS = [
@@ -28,33 +35,157 @@ ASK_TESTS = [
     {"question": "What’s the busiest month for bookings?"}
 ]
 
-def measure_time(url: str, payload: dict, iterations: int = 5) -> tuple:
-    times = []
-    for _ in range(iterations):
-        start = time.time()
-        response = requests.post(url, json=payload)
-        if response.status_code == 200:
-            times.append(time.time() - start)
-        else:
-            print(f"Error for {payload}: {response.text}")
-            return None, None
-    return mean(times), stdev(times)
-
-def benchmark_api():
-    print("Benchmarking /analytics Endpoint...")
-    for test in ANALYTICS_TESTS:
-        avg_time, std_dev = measure_time(ANALYTICS_URL, test)
-        if avg_time:
-            print(f"Report: {test['report_type']}, Avg Time: {avg_time:.3f}s, Std Dev: {std_dev:.3f}s")
-    print("-" * 50)
-
-    print("Benchmarking /ask Endpoint...")
-    for test in ASK_TESTS:
-        avg_time, std_dev = measure_time(ASK_URL, test)
-        if avg_time:
-            print(f"Question: {test['question']}, Avg Time: {avg_time:.3f}s, Std Dev: {std_dev:.3f}s")
-    print("-" * 50)
 
-if __name__ == "__main__":
-    benchmark_api()
+# Cold variant of an /ask case: every request carries a distinct question (a random
+# tag the query parser ignores), so neither the answer cache nor request coalescing
+# can serve it
+def cold_payload(payload: dict):
+    return lambda: {**payload, "question": f"{payload['question']} (ref {uuid.uuid4().hex[:8]})"}
+
+
+# In-process runs switch the API's answer caches off for cold cases, so paraphrase
+# matching can't serve the tagged questions either
+@contextmanager
+def caches_disabled(api):
+    if api is None:
+        yield
+        return
+    caches = (api.answer_cache, api.semantic_cache)
+    sizes = [cache.max_size for cache in caches]
+    for cache in caches:
+        cache.max_size = 0
+        cache.clear()
+    try:
+        yield
+    finally:
+        for cache, size in zip(caches, sizes):
+            cache.max_size = size
+
+
+def summarize(latencies: list, errors: int, elapsed: float) -> dict:
+    total = len(latencies) + errors
+    summary = {"requests": total, "errors": errors, "error_rate": errors / total if total else 0.0,
+               "requests_per_sec": total / elapsed if elapsed > 0 else 0.0}
+    if latencies:
+        ms = np.array(latencies) * 1000
+        summary.update({"p50_ms": float(np.percentile(ms, 50)), "p95_ms": float(np.percentile(ms, 95)),
+                        "p99_ms": float(np.percentile(ms, 99)), "max_ms": float(ms.max()),
+                        "mean_ms": float(ms.mean())})
+    return summary
+
+
+# `concurrency` clients each send `requests_per_client` requests back to back; payload
+# may be a function returning a fresh payload per request
+async def run_case(client: httpx.AsyncClient, path: str, payload, concurrency: int,
+                   requests_per_client: int) -> dict:
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=payload() if callable(payload) else payload)
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
 
+# /ask cases run warm (a fixed question, answered during warmup, so mostly cache hits)
+# and cold (a distinct question per request, so retrieval and the LLM run every time);
+# `api` is the in-process API module, if any
+async def benchmark_api(client: httpx.AsyncClient, ramp: list, requests_per_client: int, warmup: int,
+                        api=None) -> list:
+    cases = [(ANALYTICS_PATH, test, test['report_type'], "warm") for test in ANALYTICS_TESTS] + \
+            [(ASK_PATH, test, test['question'], "warm") for test in ASK_TESTS] + \
+            [(ASK_PATH, cold_payload(test), test['question'], "cold") for test in ASK_TESTS]
+
+    # Warmup: load models, fill caches and open connections before timing
+    for path, payload, _, cache in cases:
+        if cache == "cold":
+            continue
+        for _ in range(warmup):
+            try:
+                await client.post(path, json=payload)
+            except httpx.HTTPError:
+                pass
+
+    results = []
+    for concurrency in ramp:
+        print(f"Concurrency {concurrency}:")
+        for path, payload, name, cache in cases:
+            if cache == "cold":
+                with caches_disabled(api):
+                    summary = await run_case(client, path, payload, concurrency, requests_per_client)
+            else:
+                summary = await run_case(client, path, payload, concurrency, requests_per_client)
+            results.append({"endpoint": path, "case": name, "cache": cache, "concurrency": concurrency, **summary})
+            print(f"  {path} [{cache}] {name}: {summary['requests_per_sec']:.1f} req/s, "
+                  f"p50 {summary.get('p50_ms', float('nan')):.1f}ms, p95 {summary.get('p95_ms', float('nan')):.1f}ms, "
+                  f"p99 {summary.get('p99_ms', float('nan')):.1f}ms, max {summary.get('max_ms', float('nan')):.1f}ms, "
+                  f"errors {summary['error_rate']:.1%}")
+        print("-" * 50)
+    return results
+
+
+# Print the p99 and throughput change of each case against a previous JSON run
+def compare(results: list, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {(r['endpoint'], r['case'], r.get('cache', 'warm'), r['concurrency']): r
+                    for r in json.load(f)['results']}
+    print(f"Compared with {baseline_path}:")
+    for r in results:
+        old = baseline.get((r['endpoint'], r['case'], r['cache'], r['concurrency']))
+        if old is None or 'p99_ms' not in old or 'p99_ms' not in r:
+            continue
+        print(f"  {r['endpoint']} [{r['cache']}] {r['case']} @{r['concurrency']}: "
+              f"p99 {old['p99_ms']:.1f} -> {r['p99_ms']:.1f}ms, "
+              f"{old['requests_per_sec']:.1f} -> {r['requests_per_sec']:.1f} req/s")
+
+
+async def main(args):
+    if args.offline:
+        # Run the API in-process with Gemini replaced by the deterministic stub backend.
+        # The ASGI transport doesn't send lifespan events, so run the startup hook here.
+        import api
+        from llm_client import StubBackend
+        api.llm.backend = StubBackend(latency=args.fake_llm_latency)
+        transport = httpx.ASGITransport(app=api.app)
+        async with api.lifespan(api.app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=args.timeout) as client:
+                results = await benchmark_api(client, args.ramp, args.requests, args.warmup, api)
+    else:
+        limits = httpx.Limits(max_connections=max(args.ramp))
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+            results = await benchmark_api(client, args.ramp, args.requests, args.warmup)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"offline": args.offline, "ramp": args.ramp, "requests_per_client": args.requests,
+                       "results": results}, f, indent=2)
+        print(f"Saved results to '{args.output}'.")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the /analytics and /ask endpoints")
+    parser.add_argument('--url', default=BASE_URL)
+    parser.add_argument('--ramp', type=int, nargs='+', default=[1, 4, 16], help="concurrency levels to run")
+    parser.add_argument('--requests', type=int, default=20, help="requests per client per case")
+    parser.add_argument('--warmup', type=int, default=2, help="untimed requests per case before measuring")
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--output', help="write results as JSON")
+    parser.add_argument('--compare', help="JSON results of a previous run to compare against")
+    parser.add_argument('--offline', action='store_true',
+                        help="run the API in-process with the deterministic stub LLM backend")
+    parser.add_argument('--fake-llm-latency', type=float, default=0.0, help="seconds per fake LLM call")
+    asyncio.run(main(parser.parse_args()))
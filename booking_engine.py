@@ -0,0 +1,477 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# File: booking_engine.py
+import argparse
+import json
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import context_builder
+from analytics_cube import AnalyticsCube, store_filter_index
+from answer_cache import normalize_question
+from columnar_store import SERVING_COLUMNS, STORE_PATH, has_store, load_bookings
+from context_builder import SYSTEM_INSTRUCTION, build_prompt, estimate_tokens
+from llm_client import LLMUnavailable, client_from_env, retrieval_only_answer
+from metrics import TOKEN_BUCKETS, Metrics, resident_bytes
+from query_engine import answer_structured, answer_structured_batch, applied_filters, extract_filters, select_args
+
+INDEX_PATH = 'hotel_booking_index.faiss'
+MODEL_NAME = 'all-MiniLM-L6-v2'
+K = 5
+REPORT_TYPES = ["revenue_trends", "cancellation_rate", "top_locations", "lead_time_distribution"]
+MAX_BINS = 200
+FILTER_FIELDS = ['start_date', 'end_date', 'hotel', 'country', 'market_segment', 'is_canceled']
+NO_ANSWER = "No relevant information found."
+NO_MATCH = "No bookings match the filters in the question."
+
+
+def degraded_text(context_data: str) -> str:
+    fallback = retrieval_only_answer(context_data)
+    return f"{fallback['answer']}\n\n```\n{fallback['context']}\n```"
+
+
+# Questions whose filters match no bookings are answered without retrieval or the LLM
+def no_match_answer(filters: dict) -> dict:
+    return {"answer": NO_MATCH, "filters": filters}
+
+
+# An empty id array (as opposed to None, an unrestricted search) means nothing matched
+def is_empty_scope(ids) -> bool:
+    return ids is not None and len(ids) == 0
+
+
+# One bulk Q&A result. source is "structured", "no_match", "cache", "rag" or "degraded"; timing has
+# the seconds of each stage the question went through (batch stages are shared by
+# every question in them, "llm" is the question's own call).
+def batch_result(question: str, entry: dict, response: dict, source: str, llm_seconds: float = None) -> dict:
+    timing = dict(entry.get("timing", {}))
+    if llm_seconds is not None:
+        timing["llm"] = llm_seconds
+    return {"question": question, "source": source, "response": response, "timing": timing}
+
+
+# Everything both front ends need, loaded once per process: the booking frame, the
+# precomputed analytics, the FAISS index, the embedding model and the LLM client.
+# The API wraps it with caches, batching and async endpoints; app.py calls it directly
+# (or uses RemoteEngine against a running API).
+class BookingEngine:
+    def __init__(self, store_path: str = STORE_PATH, index_path: str = INDEX_PATH, shared: bool = False,
+                 analytics_only: bool = False, llm=None, metrics: Metrics = None):
+        self.store_path = store_path
+        self.index_path = index_path
+        self.shared = shared  # memory-map the index read-only so workers share its pages
+        self.analytics_only = analytics_only  # don't load the index until it's needed
+        self.llm = llm or client_from_env(system_instruction=SYSTEM_INSTRUCTION)
+        self.metrics = metrics or Metrics()
+        self.readiness = {"data": "pending", "index": "pending", "model": "pending", "llm": "pending"}
+        self.data, self.index, self.cube = None, None, None
+        self.model, self.model_load_seconds = None, 0.0
+        self.memory = {}  # resident set size around the last load and the frame's size
+        self.on_change = []  # called (under the data lock) after the data or index changes
+        self.data_version = 0  # bumped on every change, for caches keyed on the data
+        # data_lock serializes reloads and ingests; index_lock keeps FAISS searches and adds
+        # apart; load_lock guards lazy loads of the index and model
+        self.data_lock = threading.Lock()
+        self.index_lock = threading.Lock()
+        self.load_lock = threading.Lock()
+
+    def _changed(self):
+        self.data_version += 1
+        for callback in self.on_change:
+            callback()
+
+    def read_index(self):
+        from faiss_index import load_index
+        self.readiness["index"] = "loading"
+        loaded = load_index(self.index_path, mmap=self.shared)
+        self.readiness["index"] = "ready"
+        return loaded
+
+    # The cube's filter index lives in the store (memory-mapped, so workers share it);
+    # the version is read before the data so files never claim newer data than they hold
+    def _filter_index(self) -> tuple:
+        return store_filter_index(self.store_path) if has_store(self.store_path) else (None, None)
+
+    # Load data, FAISS index and precomputed analytics. Only SERVING_COLUMNS are loaded
+    # (categoricals and downcast integers, memory-mapped from the store where it exists);
+    # the prompt packs the structured CONTEXT_COLUMNS, so booking text stays in the store.
+    def load(self):
+        with self.data_lock:
+            self.readiness["data"] = "loading"
+            rss_before = resident_bytes()
+            filter_index = self._filter_index()
+            self.data = load_bookings(self.store_path, columns=SERVING_COLUMNS)
+            self.cube = AnalyticsCube(self.data, *filter_index)
+            self.memory = {"rss_before_load": rss_before, "rss_after_load": resident_bytes(),
+                           "frame_bytes": int(self.data.memory_usage(deep=True).sum())}
+            self.readiness["data"] = "ready"
+            self.index = None if self.analytics_only else self.read_index()
+            self._changed()
+        return self
+
+    def get_index(self):
+        if self.index is None:
+            with self.load_lock:
+                if self.index is None:
+                    self.index = self.read_index()
+        return self.index
+
+    def get_model(self):
+        if self.model is None:
+            with self.load_lock:
+                if self.model is None:
+                    self.readiness["model"] = "loading"
+                    start = time.perf_counter()
+                    with self.metrics.span("model_load"):
+                        from sentence_transformers import SentenceTransformer
+                        self.model = SentenceTransformer(MODEL_NAME)
+                    self.model_load_seconds = time.perf_counter() - start
+                    self.readiness["model"] = "ready"
+        return self.model
+
+    def load_llm(self):
+        self.llm.backend.load()
+        self.readiness["llm"] = "ready"
+
+    # Load the model and LLM client and run one encode + search so the first
+    # question doesn't pay for imports, model load or FAISS page-in
+    def warm_up(self):
+        for component, step in (("llm", self.load_llm), ("model", lambda: self.search(self.encode(["warm-up"]), K))):
+            try:
+                step()
+            except Exception as e:
+                self.readiness[component] = f"error: {str(e)}"
+
+    def encode(self, queries) -> np.ndarray:
+        model = self.get_model()
+        with self.metrics.span("encode"):
+            return np.asarray(model.encode(queries), dtype=np.float32)
+
+    def search(self, embeddings, k: int = K, ids=None):
+        from faiss_index import search_ids
+        searchable = self.get_index()
+        with self.index_lock, self.metrics.span("faiss_search"):
+            if ids is None:
+                return searchable.search(embeddings, k)
+            return search_ids(searchable, embeddings, k, ids)
+
+    # Clean and embed new rows, persist them, then publish them. The rows are appended to
+    # the store and the index file is rewritten before the new frame (reloaded from the
+    # store, so it matches what load() gives) and cube are swapped in; the vectors are
+    # added after that, so a search result never points past the frame.
+    def ingest(self, raw: pd.DataFrame) -> int:
+        from ingest import append_store, prepare_rows, write_index
+        rows = prepare_rows(raw)
+        embeddings = self.encode(rows['text'].tolist())
+        with self.data_lock:
+            append_store(rows, embeddings, self.store_path)
+            filter_index = self._filter_index()
+            new_data = load_bookings(self.store_path, columns=SERVING_COLUMNS)
+            new_cube = AnalyticsCube(new_data, *filter_index)
+            self.data, self.cube = new_data, new_cube
+            searchable = self.get_index()
+            with self.index_lock:
+                searchable.add(embeddings)
+                write_index(searchable, self.index_path)
+            self._changed()
+        return len(rows)
+
+    # Filtered reports select rows through the cube's FilterIndex (date slice + posting lists)
+    def _filtered_analytics(self, report_type: str, filters: dict, bins: int) -> dict:
+        rows = self.cube.rows
+        positions = rows.select(filters.pop('start_date', None), filters.pop('end_date', None), **filters)
+        if report_type == "revenue_trends":
+            report = rows.revenue_trends(positions)
+        elif report_type == "cancellation_rate":
+            report = f"{rows.cancellation_rate(positions):.2f}%"
+        elif report_type == "top_locations":
+            report = rows.top_locations(positions, 10)
+        else:
+            report = rows.lead_time_distribution(positions, bins=bins)
+        return {report_type: report, "matched_rows": int(len(positions))}
+
+    # Raises ValueError for an unknown report type or bin count. `bins` applies to
+    # lead_time_distribution (the analytics page's chart asks for 50, see charts.py).
+    def analytics(self, report_type: str, filters: dict = None, bins: int = 10) -> dict:
+        report_type = report_type.lower()
+        if report_type not in REPORT_TYPES:
+            raise ValueError(f"Invalid report type. Options: {', '.join(REPORT_TYPES)}")
+        if not 1 <= bins <= MAX_BINS:
+            raise ValueError(f"bins must be between 1 and {MAX_BINS}")
+        filters = {name: value for name, value in (filters or {}).items() if value is not None}
+        if filters:
+            return self._filtered_analytics(report_type, filters, bins)
+
+        cube = self.cube
+        if report_type == "revenue_trends":
+            return {"revenue_trends": cube.revenue_trends()}
+        elif report_type == "cancellation_rate":
+            return {"cancellation_rate": f"{cube.cancellation_rate():.2f}%"}
+        elif report_type == "top_locations":
+            return {"top_locations": cube.top_locations(10)}
+        return {"lead_time_distribution": cube.lead_time_distribution(bins=bins)}
+
+    # Structured questions are compiled to an aggregate spec and answered from the cube
+    # (see query_engine.py); None means the question needs retrieval + LLM
+    def answer_structured(self, query: str):
+        return answer_structured(query, self.cube)
+
+    # Filters -> (row ids retrieval may return, None for an unrestricted search or an
+    # empty array when nothing matches, aggregates for the prompt). The aggregates always
+    # describe the rows retrieval searches, so the prompt's numbers and rows agree.
+    @staticmethod
+    def _scope(cube, filters: dict):
+        rows = cube.rows
+        positions = rows.select(**select_args(filters)) if filters else None
+        if positions is None or len(positions) == len(rows.order):
+            return None, cube.summary()  # the whole dataset is searched
+        return rows.row_ids(positions), rows.summary(positions)
+
+    # Filters from the question (and request) -> (row ids or None, the filters that were
+    # applied, aggregates). A month without a year isn't applied, so it isn't returned.
+    def retrieval_scope(self, query: str, overrides: dict = None):
+        cube = self.cube
+        filters = applied_filters({**extract_filters(query, cube.country_names), **(overrides or {})})
+        ids, summary = self._scope(cube, filters)
+        return ids, filters, summary
+
+    def build_context(self, ids, filters: dict, summary: dict) -> str:
+        ids = [int(i) for i in ids if i >= 0]  # filtered searches pad missing hits with -1
+        return context_builder.build_context(self.data, ids, summary, filters)
+
+    # The instructions go to the LLM once as its system instruction; each prompt
+    # carries only the question and the packed context (see context_builder.py)
+    def prompt(self, query: str, context_data: str) -> str:
+        prompt = build_prompt(query, context_data)
+        self.metrics.record("prompt_tokens", estimate_tokens(prompt), buckets=TOKEN_BUCKETS)
+        return prompt
+
+    # Unbatched retrieval for one question within a retrieval_scope -> (row ids, packed context)
+    def retrieve_context(self, query: str, scope: tuple):
+        ids, filters, summary = scope
+        _, I = self.search(self.encode([query]), K, ids)
+        found = [int(i) for i in I[0] if i >= 0]
+        return found, self.build_context(found, filters, summary)
+
+    # Blocking question answering: structured answer, else retrieval + LLM, falling
+    # back to a retrieval-only answer when the LLM is unavailable
+    def ask(self, query: str, overrides: dict = None) -> dict:
+        answer = self.answer_structured(query) if not overrides else None
+        if answer is not None:
+            return answer
+        scope = self.retrieval_scope(query, overrides)
+        if is_empty_scope(scope[0]):
+            return no_match_answer(scope[1])
+        _, context_data = self.retrieve_context(query, scope)
+        try:
+            self.load_llm()
+            return {"answer": self.llm.generate_sync(self.prompt(query, context_data)).strip() or NO_ANSWER}
+        except LLMUnavailable:
+            return retrieval_only_answer(context_data)
+
+    # Bulk questions [(question, overrides)], prepared together: structured questions are
+    # answered in one pass over the cube, the rest are encoded in one call and searched
+    # with one FAISS call per retrieval scope (all unfiltered questions share one), and
+    # rows retrieved by several questions are read from the frame and formatted once. Duplicates are
+    # prepared once and share an entry, and questions whose filters match nothing get a
+    # no-match answer. Returns, in input order, {"answer", "timing"} (with "source":
+    # "no_match" for those) or {"ids", "context", "timing"}.
+    def prepare_batch(self, items) -> list:
+        cube = self.cube
+        keys = [(normalize_question(query), tuple(sorted((overrides or {}).items()))) for query, overrides in items]
+        unique = {}
+        for key, item in zip(keys, items):
+            unique.setdefault(key, item)
+        prepared = {}
+
+        start = time.perf_counter()
+        with self.metrics.span("analytics_query"):
+            plain = [key for key, (_, overrides) in unique.items() if not overrides]
+            answers = answer_structured_batch([unique[key][0] for key in plain], cube)
+        timing = {"structured": time.perf_counter() - start}
+        for key, answer in zip(plain, answers):
+            if answer is not None:
+                prepared[key] = {"answer": answer, "timing": timing}
+
+        pending = [key for key in unique if key not in prepared]
+        start = time.perf_counter()
+        scopes, groups = {}, {}
+        if pending:
+            for key in pending:
+                query, overrides = unique[key]
+                filters = applied_filters({**extract_filters(query, cube.country_names), **(overrides or {})})
+                scope_key = tuple(sorted(filters.items()))
+                if scope_key not in scopes:
+                    scopes[scope_key] = (filters,) + self._scope(cube, filters)
+                groups.setdefault(scope_key, []).append(key)
+            for scope_key, members in list(groups.items()):
+                filters, ids, _ = scopes[scope_key]
+                if is_empty_scope(ids):
+                    for key in groups.pop(scope_key):
+                        prepared[key] = {"answer": no_match_answer(filters), "source": "no_match", "timing": timing}
+            pending = [key for members in groups.values() for key in members]
+        if pending:
+            embeddings = self.encode([unique[key][0] for key in pending])
+            row = {key: position for position, key in enumerate(pending)}
+            unfiltered = [key for scope_key, members in groups.items() if scopes[scope_key][1] is None
+                          for key in members]
+            searches = [(None, unfiltered)] if unfiltered else []
+            searches += [(scopes[scope_key][1], members) for scope_key, members in groups.items()
+                         if scopes[scope_key][1] is not None]
+            found = {}
+            for ids, members in searches:
+                _, I = self.search(embeddings[[row[key] for key in members]], K, ids)
+                for key, hits in zip(members, I):
+                    found[key] = [int(i) for i in hits if i >= 0]
+            timing = {**timing, "retrieval": time.perf_counter() - start}
+
+            start = time.perf_counter()
+            contexts, packed, rows = {}, {}, {}
+            with self.metrics.span("context"):
+                for scope_key, members in groups.items():
+                    filters, _, summary = scopes[scope_key]
+                    for key in members:
+                        # questions in one scope that retrieved the same rows share a context
+                        context_key = (scope_key, tuple(found[key]))
+                        if context_key not in packed:
+                            packed[context_key] = context_builder.build_context(
+                                self.data, found[key], summary, filters, memo=rows)
+                        contexts[key] = packed[context_key]
+            timing = {**timing, "context": time.perf_counter() - start}
+            for key in pending:
+                prepared[key] = {"ids": found[key], "context": contexts[key], "timing": timing}
+        return [prepared[key] for key in keys]
+
+    # LLM answer for a prepared entry, or a retrieval-only answer when the LLM is unavailable
+    def _batch_answer(self, question: str, entry: dict) -> dict:
+        start = time.perf_counter()
+        try:
+            self.load_llm()
+            text = self.llm.generate_sync(self.prompt(question, entry["context"]))
+            response, source = {"answer": text.strip() or NO_ANSWER}, "rag"
+        except LLMUnavailable:
+            response, source = retrieval_only_answer(entry["context"]), "degraded"
+        return batch_result(question, entry, response, source, time.perf_counter() - start)
+
+    # Blocking bulk answering: prepare_batch, then one LLM call per distinct retrieved
+    # question with at most `concurrency` in flight (default: the LLM client's limit).
+    # Returns batch_result dicts in input order.
+    def ask_batch(self, items, concurrency: int = None) -> list:
+        prepared = self.prepare_batch(items)
+        calls = {}
+        with ThreadPoolExecutor(max_workers=concurrency or self.llm.concurrency) as pool:
+            for (question, _), entry in zip(items, prepared):
+                if "context" in entry and id(entry) not in calls:
+                    calls[id(entry)] = pool.submit(self._batch_answer, question, entry)
+        results = []
+        for (question, _), entry in zip(items, prepared):
+            if "context" in entry:
+                answered = calls[id(entry)].result()
+                results.append(batch_result(question, entry, answered["response"], answered["source"],
+                                            answered["timing"]["llm"]))
+            else:
+                results.append(batch_result(question, entry, entry["answer"], entry.get("source", "structured")))
+        return results
+
+    def stream_answer(self, query: str, context_data: str):
+        started = False
+        try:
+            self.load_llm()
+            for chunk in self.llm.stream_sync(self.prompt(query, context_data)):
+                started = True
+                yield chunk
+        except LLMUnavailable as e:
+            yield f"\n\nError: {str(e)}" if started else degraded_text(context_data)
+
+    # Like ask, but a RAG answer comes back as {"Context IDs": [...], "Answer": <text chunks>}
+    # with the retrieved ids available before the LLM starts
+    def ask_stream(self, query: str) -> dict:
+        answer = self.answer_structured(query)
+        if answer is not None:
+            return answer
+        scope = self.retrieval_scope(query)
+        if is_empty_scope(scope[0]):
+            return no_match_answer(scope[1])
+        ids, context_data = self.retrieve_context(query, scope)
+        return {"Context IDs": ids, "Answer": self.stream_answer(query, context_data)}
+
+
+# Same interface as BookingEngine for the front end, backed by a running API
+class RemoteEngine:
+    data_version = 0  # the API's data changes are not visible here; callers rely on TTLs
+
+    def __init__(self, url: str, timeout: float = 60.0):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _post(self, path: str, payload: dict, stream: bool = False):
+        import requests
+        response = requests.post(f"{self.url}{path}", json=payload, timeout=self.timeout, stream=stream)
+        response.raise_for_status()
+        return response
+
+    def analytics(self, report_type: str, filters: dict = None, bins: int = 10) -> dict:
+        return self._post("/analytics", {"report_type": report_type, "bins": bins, **(filters or {})}).json()
+
+    def ask(self, query: str, overrides: dict = None) -> dict:
+        return self._post("/ask", {"question": query, **(overrides or {})}).json()
+
+    @staticmethod
+    def _events(response):
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                yield event, json.loads(line[len("data: "):])
+
+    @staticmethod
+    def _text(events):
+        for event, payload in events:
+            if event == "token":
+                yield payload["text"]
+            elif event == "answer":  # semantic cache hit or degraded answer after "context"
+                yield degraded_text(payload["context"]) if payload.get("degraded") else payload.get("answer", "")
+            elif event == "error":
+                yield f"\n\nError: {payload['detail']}"
+
+    def ask_stream(self, query: str) -> dict:
+        events = self._events(self._post("/ask/stream", {"question": query}, stream=True))
+        event, payload = next(events, ("error", {"detail": "empty response"}))
+        if event == "context":
+            return {"Context IDs": payload["ids"], "Answer": self._text(events)}
+        if event == "answer" and payload.get("degraded"):
+            return {"Context IDs": [], "Answer": self._text([(event, payload)])}
+        if event == "error":
+            raise RuntimeError(payload["detail"])
+        return payload
+
+
+def _measure_load(columns):
+    before = resident_bytes()
+    frame = load_bookings(columns=columns)
+    return len(frame.columns), int(frame.memory_usage(deep=True).sum()), resident_bytes() - before
+
+
+# Compare the serving frame with the full frame, each loaded in a fresh process
+def memory_report():
+    context = multiprocessing.get_context('spawn')
+    for label, columns in (("full frame", None), ("serving frame", SERVING_COLUMNS)):
+        with context.Pool(1) as pool:
+            count, frame_bytes, rss_growth = pool.apply(_measure_load, (columns,))
+        print(f"{label:<14} {count:>3} columns  frame {frame_bytes / 2**20:>9.1f} MiB  "
+              f"resident +{rss_growth / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    argparse.ArgumentParser(description="Report the memory used by the booking frame").parse_args()
+    memory_report()
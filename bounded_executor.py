@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# File: bounded_executor.py
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+
+
+# Raised when a pool or admission limit is full; the API turns it into a 429
+class Overloaded(Exception):
+    pass
+
+
+# Caps the number of requests in flight. slot() raises Overloaded instead of
+# queueing once `max_in_flight` requests hold a slot.
+class AdmissionLimit:
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def _admit(self):
+        if self.in_flight >= self.max_in_flight:
+            self.rejected += 1
+            raise Overloaded(f"More than {self.max_in_flight} requests in flight")
+
+    # Raise Overloaded if slot() would, without taking a slot
+    def check(self):
+        with self._lock:
+            self._admit()
+
+    @contextmanager
+    def slot(self):
+        with self._lock:
+            self._admit()
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+# Thread pool for blocking (pandas/numpy/FAISS) work called from async endpoints,
+# with a bound on running + queued calls so a slow burst is rejected rather than
+# piling up behind the pool.
+class BoundedExecutor:
+    def __init__(self, max_workers: int, max_pending: int):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="api-worker")
+        self._limit = AdmissionLimit(max_workers + max_pending)
+
+    async def run(self, fn, *args, **kwargs):
+        with self._limit.slot():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, partial(fn, *args, **kwargs))
+
+    def stats(self) -> dict:
+        return {"in_flight": self._limit.in_flight, "max_in_flight": self._limit.max_in_flight,
+                "rejected": self._limit.rejected}
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# File: charts.py
+import io
+import re
+
+import numpy as np
+import pandas as pd
+import seaborn as sns
+from matplotlib.figure import Figure
+
+# Analytics charts rendered from report data to PNG bytes. Figures are created with
+# the object-oriented API (not pyplot's global state), so sessions can render safely
+# from Streamlit's script threads.
+FIGSIZE = (10, 6)
+DPI = 100
+LEAD_TIME_BINS = 50  # same resolution as the original histplot
+
+
+def _png(fig: Figure) -> bytes:
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=DPI, bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def render_revenue_trends(trends: list) -> bytes:
+    revenue_trends = pd.DataFrame(trends)
+    revenue_trends['arrival_date'] = pd.to_datetime(revenue_trends['arrival_date'])
+    fig = Figure(figsize=FIGSIZE)
+    ax = fig.subplots()
+    sns.lineplot(x='arrival_date', y='revenue', data=revenue_trends, ax=ax)
+    ax.set_title('Revenue Trends Over Time')
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Total Revenue ($)')
+    return _png(fig)
+
+
+def render_top_locations(locations: dict) -> bytes:
+    fig = Figure(figsize=FIGSIZE)
+    ax = fig.subplots()
+    pd.Series(locations).plot(kind='bar', ax=ax, color='skyblue')
+    ax.set_title('Top 10 Booking Countries')
+    ax.set_xlabel('Country')
+    ax.set_ylabel('Number of Bookings')
+    return _png(fig)
+
+
+# Interval bounds of a lead time bin: a pandas Interval in-process, its string form
+# ("(-0.737, 73.7]") when the report came through the API
+def _bounds(interval) -> tuple:
+    if hasattr(interval, 'left'):
+        return float(interval.left), float(interval.right)
+    left, right = re.findall(r'-?\d+(?:\.\d+)?(?:e[-+]?\d+)?', str(interval))[:2]
+    return float(left), float(right)
+
+
+# Gaussian KDE over bin centers weighted by bin counts, scaled to counts per bin, so
+# the curve costs O(bins x grid) instead of O(rows)
+def binned_kde(centers: np.ndarray, counts: np.ndarray, width: float, grid: np.ndarray) -> np.ndarray:
+    total = counts.sum()
+    if total == 0:
+        return np.zeros_like(grid)
+    mean = np.average(centers, weights=counts)
+    std = np.sqrt(np.average((centers - mean) ** 2, weights=counts))
+    bandwidth = max(1.06 * std * total ** -0.2, width / 2)  # Scott's rule, no finer than the bins
+    z = (grid[:, None] - centers[None, :]) / bandwidth
+    density = (np.exp(-0.5 * z ** 2) * counts).sum(axis=1) / (total * bandwidth * np.sqrt(2 * np.pi))
+    return density * total * width
+
+
+def render_lead_time_distribution(distribution: dict) -> bytes:
+    bounds = np.array([_bounds(interval) for interval in distribution]).reshape(-1, 2)
+    counts = np.array(list(distribution.values()), dtype=np.float64)
+    fig = Figure(figsize=FIGSIZE)
+    ax = fig.subplots()
+    if len(counts):
+        left, right = bounds[:, 0], bounds[:, 1]
+        width = float(np.median(right - left))
+        centers = (left + right) / 2
+        ax.bar(centers, counts, width=right - left, color='orange', edgecolor='white')
+        grid = np.linspace(left.min(), right.max(), 200)
+        ax.plot(grid, binned_kde(centers, counts, width, grid), color='darkorange')
+    ax.set_title('Booking Lead Time Distribution')
+    ax.set_xlabel('Lead Time (days)')
+    ax.set_ylabel('Frequency')
+    return _png(fig)
+
+
+# Chart name -> (report it is drawn from, bins to ask for, renderer)
+CHARTS = {
+    "revenue_trends": ("revenue_trends", 10, render_revenue_trends),
+    "top_locations": ("top_locations", 10, render_top_locations),
+    "lead_time_distribution": ("lead_time_distribution", LEAD_TIME_BINS, render_lead_time_distribution),
+}
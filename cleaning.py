@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# File: cleaning.py
+import argparse
+import time
+
+import pandas as pd
+
+DROP_COLUMNS = ['reservation_status_date', 'agent', 'company']
+MONTH_NUMBERS = {'January': 1, 'February': 2, 'March': 3, 'April': 4, 'May': 5, 'June': 6, 'July': 7,
+                 'August': 8, 'September': 9, 'October': 10, 'November': 11, 'December': 12}
+CHUNK_SIZE = 100_000
+
+
+# Cleaning shared by Data_cleaning.py and incremental ingestion (ingest.py)
+def clean_bookings(df: pd.DataFrame) -> pd.DataFrame:
+    # Handle missing values (agent/company are dropped below, so they need no fill)
+    df = df.drop(columns=DROP_COLUMNS, errors='ignore')
+    df['children'] = df['children'].fillna(0)  # Assume 0 children if missing
+    df['country'] = df['country'].fillna('Unknown')
+
+    # Calculate total nights and revenue
+    df['total_nights'] = df['stays_in_weekend_nights'] + df['stays_in_week_nights']
+    df['revenue'] = df['adr'] * df['total_nights']
+
+    # Create a unified date column from year / month number / day, without formatting
+    # and re-parsing date strings
+    df['arrival_date'] = pd.to_datetime(pd.DataFrame({
+        'year': df['arrival_date_year'],
+        'month': df['arrival_date_month'].map(MONTH_NUMBERS),
+        'day': df['arrival_date_day_of_month'],
+    }))
+    return df
+
+
+# Clean a raw booking CSV in fixed-size chunks so memory stays bounded by the chunk
+# size. Cleaned chunks are appended to `dst` (if given); with collect=False nothing
+# is kept in memory (streaming mode) and None is returned.
+def clean_file(src: str, dst: str = None, chunksize: int = CHUNK_SIZE, collect: bool = True):
+    start = time.perf_counter()
+    rows = 0
+    chunks = []
+    for i, chunk in enumerate(pd.read_csv(src, chunksize=chunksize)):
+        chunk = clean_bookings(chunk)
+        if dst is not None:
+            chunk.to_csv(dst, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        if collect:
+            chunks.append(chunk)
+        rows += len(chunk)
+        elapsed = time.perf_counter() - start
+        print(f"Cleaned {rows} rows ({rows / elapsed:,.0f} rows/sec)")
+    if not collect:
+        return None
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+
+# Streaming mode for large exports: python cleaning.py raw.csv cleaned.csv --chunksize 200000
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean a raw booking CSV in chunks")
+    parser.add_argument('src')
+    parser.add_argument('dst')
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+    clean_file(args.src, args.dst, chunksize=args.chunksize, collect=False)
+    print(f"Data cleaning completed. Saved to '{args.dst}'.")
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# File: columnar_store.py
+import io
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+CSV_PATH = 'hotel_bookings_with_embeddings.csv'
+STORE_PATH = 'hotel_bookings_with_embeddings.store'
+EMBEDDING_COLUMN = 'embedding'
+
+# Strings with at most this many distinct values are stored as category codes;
+# free text (and anything with more distinct values) goes into a utf-8 blob + offsets
+MAX_CATEGORIES = 32767
+TEXT_COLUMNS = ['text']
+# Columns the serving paths read (analytics cube, filter index, structured answers and
+# prompt context); the API and app load only these
+SERVING_COLUMNS = ['arrival_date', 'hotel', 'country', 'market_segment', 'is_canceled',
+                   'lead_time', 'total_nights', 'adr', 'revenue']
+
+
+def parse_embeddings(values) -> np.ndarray:
+    # Embeddings were written to CSV as "[0.1, 0.2, ...]" (or numpy's space separated repr)
+    rows = [np.fromstring(str(v).strip('[]').replace(',', ' '), sep=' ', dtype=np.float32) for v in values]
+    return np.vstack(rows).astype(np.float32) if rows else np.zeros((0, 0), dtype=np.float32)
+
+
+# Smallest integer dtype that holds every value (floats are left alone: revenue and
+# ADR sums must stay exact to the cent)
+def smallest_int_dtype(col) -> np.dtype:
+    low, high = (int(col.min()), int(col.max())) if len(col) else (0, 0)
+    for dtype in (np.int8, np.int16, np.int32):
+        if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+# Downcast integers and turn low-cardinality strings into categoricals, keeping only
+# `columns` (if given). Used for frames read from the CSV; the store is already compact.
+def compact_frame(df: pd.DataFrame, columns: list = None) -> pd.DataFrame:
+    if columns is not None:
+        df = df[[name for name in columns if name in df.columns]]
+    compact = {}
+    for name in df.columns:
+        col = df[name]
+        if pd.api.types.is_integer_dtype(col) and not pd.api.types.is_bool_dtype(col):
+            col = col.astype(smallest_int_dtype(col))
+        elif col.dtype == object and name not in TEXT_COLUMNS and col.nunique(dropna=False) <= MAX_CATEGORIES:
+            col = col.astype('category')
+        compact[name] = col
+    return pd.DataFrame(compact)
+
+
+def save_columnar(df: pd.DataFrame, path: str, embeddings: np.ndarray = None):
+    os.makedirs(path, exist_ok=True)
+    if embeddings is None and EMBEDDING_COLUMN in df.columns:
+        embeddings = parse_embeddings(df[EMBEDDING_COLUMN])
+    df = df.drop(columns=[EMBEDDING_COLUMN], errors='ignore')
+
+    columns = []
+    for name in df.columns:
+        col = df[name]
+        if pd.api.types.is_datetime64_any_dtype(col):
+            np.save(os.path.join(path, f'{name}.npy'), col.to_numpy(dtype='datetime64[ns]'))
+            columns.append({"name": name, "kind": "datetime"})
+        elif pd.api.types.is_bool_dtype(col) or (
+                pd.api.types.is_integer_dtype(col) and col.min() >= 0 and col.max() <= 1):
+            # 0/1 flags such as is_canceled / is_repeated_guest
+            np.save(os.path.join(path, f'{name}.npy'), col.to_numpy(dtype=np.int8))
+            columns.append({"name": name, "kind": "numeric"})
+        elif pd.api.types.is_integer_dtype(col):
+            np.save(os.path.join(path, f'{name}.npy'), col.to_numpy(dtype=smallest_int_dtype(col)))
+            columns.append({"name": name, "kind": "numeric"})
+        elif pd.api.types.is_numeric_dtype(col):
+            np.save(os.path.join(path, f'{name}.npy'), col.to_numpy())
+            columns.append({"name": name, "kind": "numeric"})
+        elif name not in TEXT_COLUMNS and col.nunique(dropna=False) <= MAX_CATEGORIES:
+            cat = col.astype('category')
+            codes = cat.cat.codes.to_numpy()
+            codes = codes.astype(np.int8 if len(cat.cat.categories) < 127 else np.int16)
+            np.save(os.path.join(path, f'{name}.codes.npy'), codes)
+            columns.append({"name": name, "kind": "category",
+                            "categories": [str(c) for c in cat.cat.categories]})
+        else:
+            encoded = [str(v).encode('utf-8') for v in col.fillna('')]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(b) for b in encoded], out=offsets[1:])
+            with open(os.path.join(path, f'{name}.bin'), 'wb') as f:
+                f.write(b''.join(encoded))
+            np.save(os.path.join(path, f'{name}.offsets.npy'), offsets)
+            columns.append({"name": name, "kind": "text"})
+
+    if embeddings is not None:
+        np.save(os.path.join(path, 'embeddings.npy'), np.ascontiguousarray(embeddings, dtype=np.float32))
+    write_meta(path, {"rows": int(len(df)), "columns": columns, "embeddings": embeddings is not None})
+
+
+def read_meta(path: str) -> dict:
+    with open(os.path.join(path, 'meta.json')) as f:
+        return json.load(f)
+
+
+# meta.json is replaced atomically and written last: its row count is what readers
+# trust, so a store is only ever seen before or after a write
+def write_meta(path: str, meta: dict):
+    tmp = os.path.join(path, 'meta.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, os.path.join(path, 'meta.json'))
+
+
+def _fits(values: np.ndarray, dtype: np.dtype) -> bool:
+    if values.dtype == dtype:
+        return True
+    if np.issubdtype(dtype, np.integer):
+        if not np.issubdtype(values.dtype, np.integer) and not (
+                np.issubdtype(values.dtype, np.floating) and np.isfinite(values).all()
+                and (values == np.round(values)).all()):
+            return False
+        info = np.iinfo(dtype)
+        return len(values) == 0 or (info.min <= values.min() and values.max() <= info.max)
+    return np.can_cast(values.dtype, dtype, 'same_kind')
+
+
+# Append to a .npy file after its first `rows` rows (dropping anything a failed append
+# left behind) and rewrite the shape in its header. numpy pads headers so the shape can
+# grow in place, and bytes already written never change, so existing memory maps stay
+# valid. Values that don't fit the file's dtype (or an unpadded header) fall back to
+# rewriting the file with a wider dtype.
+def _append_npy(file: str, rows: int, values: np.ndarray):
+    with open(file, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else \
+            np.lib.format.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(f)
+        data_offset = f.tell()
+        header = io.BytesIO()
+        write_header = np.lib.format.write_array_header_1_0 if version == (1, 0) else \
+            np.lib.format.write_array_header_2_0
+        new_shape = (rows + len(values),) + tuple(shape[1:])
+        write_header(header, {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": fortran_order,
+                              "shape": new_shape})
+        if _fits(values, dtype) and not fortran_order and len(header.getvalue()) == data_offset:
+            row_bytes = dtype.itemsize * int(np.prod(shape[1:], dtype=np.int64))
+            f.seek(data_offset + rows * row_bytes)
+            f.truncate()
+            f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+            f.flush()
+            f.seek(0)
+            f.write(header.getvalue())
+            return
+    old = np.load(file, mmap_mode='r')[:rows]
+    if np.issubdtype(old.dtype, np.integer) and np.issubdtype(values.dtype, np.integer):
+        extremes = [bound for part in (old, values) if len(part) for bound in (part.min(), part.max())]
+        dtype = np.promote_types(old.dtype, smallest_int_dtype(pd.Series(extremes, dtype=np.int64)))
+    else:
+        dtype = np.result_type(old.dtype, values.dtype)
+    combined = np.concatenate([old.astype(dtype), values.astype(dtype)])
+    tmp = file + '.tmp.npy'
+    np.save(tmp, combined)
+    os.replace(tmp, file)
+
+
+# Incremental ingest: append `df` (and its embeddings) to an existing store in time and
+# memory proportional to the new rows. Column segments, text blobs/offsets and
+# embeddings are appended in place, new category values are added to the end of the
+# category list (existing codes keep their meaning), and meta.json is replaced last.
+# Columns of `df` that the store doesn't have are ignored; missing ones are left empty.
+def append_columnar(df: pd.DataFrame, path: str, embeddings: np.ndarray = None) -> int:
+    meta = read_meta(path)
+    rows, added = meta['rows'], len(df)
+    if meta.get('embeddings') and (embeddings is None or len(embeddings) != added):
+        raise ValueError("The store has embeddings: pass one embedding per appended row")
+
+    for spec in meta['columns']:
+        name = spec['name']
+        col = df[name] if name in df.columns else pd.Series([None] * added, index=df.index, dtype=object)
+        if spec['kind'] == 'datetime':
+            _append_npy(os.path.join(path, f'{name}.npy'), rows, pd.to_datetime(col).to_numpy(dtype='datetime64[ns]'))
+        elif spec['kind'] == 'numeric':
+            values = pd.to_numeric(col).to_numpy()
+            if values.dtype == bool:
+                values = values.astype(np.int8)
+            _append_npy(os.path.join(path, f'{name}.npy'), rows, values)
+        elif spec['kind'] == 'category':
+            strings = col.astype(object).where(col.notna(), None).map(lambda v: None if v is None else str(v))
+            known = set(spec['categories'])
+            spec['categories'] = spec['categories'] + [value for value in pd.unique(strings.dropna())
+                                                       if value not in known]
+            codes = pd.Categorical(strings, categories=spec['categories']).codes
+            _append_npy(os.path.join(path, f'{name}.codes.npy'), rows, np.asarray(codes, dtype=np.int64))
+        else:
+            offsets_file = os.path.join(path, f'{name}.offsets.npy')
+            end = int(np.load(offsets_file, mmap_mode='r')[rows])
+            encoded = [str(v).encode('utf-8') for v in col.fillna('')]
+            with open(os.path.join(path, f'{name}.bin'), 'r+b') as f:
+                f.seek(end)
+                f.truncate()
+                f.write(b''.join(encoded))
+            offsets = end + np.cumsum([len(b) for b in encoded], dtype=np.int64)
+            _append_npy(offsets_file, rows + 1, offsets)
+
+    if meta.get('embeddings'):
+        _append_npy(os.path.join(path, 'embeddings.npy'), rows, np.asarray(embeddings, dtype=np.float32))
+    meta['rows'] = rows + added
+    write_meta(path, meta)
+    return added
+
+
+def read_text_column(path: str, name: str, rows: int = None) -> list:
+    offsets = np.load(os.path.join(path, f'{name}.offsets.npy'))
+    if rows is not None:
+        offsets = offsets[:rows + 1]
+    with open(os.path.join(path, f'{name}.bin'), 'rb') as f:
+        raw = f.read()
+    return [raw[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+
+# Fetch only the given rows of a text column, reading the blob through a memory map
+def read_text_rows(path: str, name: str, ids) -> list:
+    offsets = np.load(os.path.join(path, f'{name}.offsets.npy'), mmap_mode='r')
+    raw = np.memmap(os.path.join(path, f'{name}.bin'), dtype=np.uint8, mode='r')
+    return [raw[offsets[i]:offsets[i + 1]].tobytes().decode('utf-8') for i in ids]
+
+
+# skip_text leaves text columns out of the frame (see read_text_rows), so processes
+# sharing the store don't each hold a private copy of the strings; `columns` limits
+# the frame to those columns
+def load_columnar(path: str, mmap: bool = True, skip_text: bool = False, columns: list = None) -> pd.DataFrame:
+    mmap_mode = 'r' if mmap else None
+    meta = read_meta(path)
+    rows = meta['rows']  # column files can run past it while an append is in progress
+
+    frame = {}
+    for spec in meta['columns']:
+        name = spec['name']
+        if columns is not None and name not in columns:
+            continue
+        if spec['kind'] in ('numeric', 'datetime'):
+            frame[name] = np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)[:rows]
+        elif spec['kind'] == 'category':
+            codes = np.load(os.path.join(path, f'{name}.codes.npy'), mmap_mode=mmap_mode)[:rows]
+            frame[name] = pd.Categorical.from_codes(codes, categories=spec['categories'])
+        elif not skip_text:
+            frame[name] = read_text_column(path, name, rows)
+    return pd.DataFrame(frame, copy=False)
+
+
+def load_embeddings(path: str = STORE_PATH, mmap: bool = True) -> np.ndarray:
+    rows = read_meta(path)['rows']
+    return np.load(os.path.join(path, 'embeddings.npy'), mmap_mode='r' if mmap else None)[:rows]
+
+
+def has_store(path: str = STORE_PATH) -> bool:
+    return os.path.exists(os.path.join(path, 'meta.json'))
+
+
+# Changes whenever the store is rewritten or appended to (meta.json is written last)
+def store_version(path: str = STORE_PATH):
+    try:
+        return os.stat(os.path.join(path, 'meta.json')).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+# Load the booking frame, preferring the memory-mapped columnar store over the CSV.
+# With `columns` (e.g. SERVING_COLUMNS) only those are read, and a CSV frame is compacted.
+def load_bookings(store_path: str = STORE_PATH, csv_path: str = CSV_PATH, skip_text: bool = False,
+                  columns: list = None) -> pd.DataFrame:
+    if has_store(store_path):
+        return load_columnar(store_path, skip_text=skip_text, columns=columns)
+    data = pd.read_csv(csv_path, usecols=(lambda name: name in columns) if columns is not None else None)
+    if 'arrival_date' in data.columns:
+        data['arrival_date'] = pd.to_datetime(data['arrival_date'])
+    return compact_frame(data) if columns is not None else data
+
+
+# Convert an existing CSV (e.g. hotel_bookings_with_embeddings.csv) into the columnar store
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else CSV_PATH
+    dst = sys.argv[2] if len(sys.argv) > 2 else STORE_PATH
+    df = pd.read_csv(src)
+    if 'arrival_date' in df.columns:
+        df['arrival_date'] = pd.to_datetime(df['arrival_date'])
+    save_columnar(df, dst)
+    print(f"Saved {len(df)} rows from '{src}' to columnar store '{dst}'.")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# File: context_builder.py
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))
+
+# Columns packed for each retrieved booking, with their short table headers
+CONTEXT_COLUMNS = [('hotel', 'hotel'), ('country', 'country'), ('arrival_date', 'arrival'),
+                   ('lead_time', 'lead_days'), ('total_nights', 'nights'), ('adr', 'adr'),
+                   ('market_segment', 'segment'), ('is_canceled', 'canceled')]
+
+# Sent once as the model's system instruction instead of being repeated in every prompt
+SYSTEM_INSTRUCTION = (
+    "You are a hotel booking analytics assistant. Answer the question using the data given: "
+    "a summary of the matching bookings and a table of the most relevant ones "
+    "(n = number of identical bookings). Be clear and concise."
+)
+
+
+def build_prompt(query, context_data):
+    return f"Question: {query}\n{context_data}"
+
+
+# Rough token count (~4 characters per token) used for the budget and for reporting
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _format(value):
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, (float, np.floating)):
+        return f"{value:.0f}"
+    return str(value)
+
+
+# Context-column rows of the given ids, each read from the frame and formatted once;
+# `memo` (id -> row) lets a batch reuse the rows several questions retrieved
+def format_rows(data: pd.DataFrame, ids, columns, memo: dict = None) -> list:
+    memo = {} if memo is None else memo
+    missing = [i for i in dict.fromkeys(ids) if i not in memo]
+    if missing:
+        frame = data.iloc[missing][[name for name, _ in columns]]
+        for i, values in zip(missing, frame.itertuples(index=False)):
+            memo[i] = "|".join(_format(v) for v in values)
+    return [memo[i] for i in ids]
+
+
+# Retrieved rows as a compact table; identical rows (after rounding) collapse into one
+# line with a count. Rows are added in retrieval order until the budget is spent.
+# Frames without the structured columns fall back to each row's text.
+def pack_rows(data: pd.DataFrame, ids, budget: int, memo: dict = None) -> str:
+    columns = [(name, label) for name, label in CONTEXT_COLUMNS if name in data.columns]
+    if not columns:
+        lines, used = [], 0
+        for text in data.iloc[ids]['text'].tolist():
+            used += estimate_tokens(text)
+            if used > budget:
+                break
+            lines.append(text)
+        return "\n".join(lines)
+
+    rows = OrderedDict()
+    for row in format_rows(data, ids, columns, memo):
+        rows[row] = rows.get(row, 0) + 1
+
+    header = "|".join(label for _, label in columns) + "|n"
+    lines, used = [header], estimate_tokens(header)
+    for row, count in rows.items():
+        line = f"{row}|{count}"
+        used += estimate_tokens(line)
+        if used > budget:
+            break
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def pack_summary(summary: dict) -> str:
+    return "Matching bookings: " + ", ".join(f"{name}={value}" for name, value in summary.items())
+
+
+# Filters + precomputed aggregates for the slice, then as many retrieved rows as fit
+def build_context(data: pd.DataFrame, ids, summary: dict, filters: dict = None,
+                  budget: int = CONTEXT_TOKEN_BUDGET, memo: dict = None) -> str:
+    parts = []
+    if filters:
+        parts.append("Filters: " + ", ".join(f"{name}={value}" for name, value in filters.items()))
+    parts.append(pack_summary(summary))
+    remaining = budget - sum(estimate_tokens(part) for part in parts)
+    parts.append(pack_rows(data, ids, max(remaining, 0), memo))
+    return "\n".join(parts)
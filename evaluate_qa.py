@@ -5,87 +5,215 @@
 
 
 # File: evaluate_qa.py
-import requests
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+import numpy as np
 import pandas as pd
-from typing import Dict, Union, Callable 
+
+from analytics_cube import MONTH_NAMES
+from columnar_store import load_bookings
 
 # API endpoint
 BASE_URL = "http://127.0.0.1:8000/ask"
+ORACLE_COLUMNS = ['arrival_date_year', 'arrival_date_month', 'country', 'is_canceled', 'revenue']
 
-# Load data for ground truth
-print("Loading data...")
-try:
-    data = pd.read_csv('hotel_bookings_with_embeddings.csv')
-except Exception as e:
-    print(f"Error loading CSV: {e}")
-    raise
-print("Converting dates...")
-try:
-    data['arrival_date'] = pd.to_datetime(data['arrival_date'])
-except Exception as e:
-    print(f"Error converting dates: {e}")
-    raise
-
-# Test queries and expected answers
-TEST_QUERIES = [
-    {
-        "query": "What’s the total revenue for July 2016?",
-        "expected": lambda d: {"Total Revenue": f"${d[(d['arrival_date_month'] == 'July') & (d['arrival_date_year'] == 2016) & (d['is_canceled'] == 0)]['revenue'].sum():.2f}", "Month": "July", "Year": "2016"}
-    },
-    {
-        "query": "What’s the cancellation rate?",
-        "expected": lambda d: {"Cancellation Rate": f"{d['is_canceled'].mean() * 100:.2f}%"}
-    },
-    {
-        "query": "Which country has the highest booking cancellations?",
-        "expected": lambda d: {"Location with Highest Cancellations": d[d['is_canceled'] == 1]['country'].value_counts().idxmax(), "Total Cancellations": int(d[d['is_canceled'] == 1]['country'].value_counts().max())}
-    },
-    {
-        "query": "Why do people cancel bookings?",
-        "expected": "qualitative"
-    },
-    {
-        "query": "What’s the busiest month for bookings?",
-        "expected": "qualitative"
-    }
-]
-
-def evaluate_query(query: str, expected: Union[Callable, str]) -> Dict:
-    print(f"Evaluating query: {query}")
-    try:
-        response = requests.post(BASE_URL, json={"question": query})
-        print(f"API Status Code: {response.status_code}")
+
+# Ground truth from one groupby over the raw booking columns (arrival_date_year /
+# arrival_date_month, not the derived arrival_date the analytics cube uses), built
+# once and shared by every generated question
+class Oracle:
+    def __init__(self, data: pd.DataFrame):
+        frame = pd.DataFrame({
+            'year': data['arrival_date_year'].astype(int),
+            'month': data['arrival_date_month'].astype(str),
+            'country': data['country'].astype(str),
+            'is_canceled': data['is_canceled'].astype(int),
+            'revenue': data['revenue'],
+        })
+        groups = frame.groupby(['year', 'month', 'country', 'is_canceled']).agg(
+            bookings=('revenue', 'size'), revenue=('revenue', 'sum'))
+        self.by_month = groups.groupby(level=['year', 'month', 'is_canceled']).sum()
+        self.by_country = groups['bookings'].groupby(level=['country', 'is_canceled']).sum().unstack(fill_value=0)
+        self.total_bookings = int(groups['bookings'].sum())
+        self.total_canceled = int(self.by_country.get(1, pd.Series(dtype=int)).sum())
+
+    def months(self) -> list:
+        keys = {(year, month) for year, month, _ in self.by_month.index}
+        return sorted(keys, key=lambda key: (key[0], MONTH_NAMES.index(key[1])))
+
+    def countries(self, min_bookings: int = 1) -> list:
+        totals = self.by_country.sum(axis=1)
+        return [country for country, total in totals.items() if total >= min_bookings]
+
+    def _booked(self, year: int, month: str):
+        key = (year, month, 0)
+        return self.by_month.loc[key] if key in self.by_month.index else None
+
+    def month_revenue(self, year: int, month: str) -> float:
+        row = self._booked(year, month)
+        return float(row['revenue']) if row is not None else 0.0
+
+    def month_bookings(self, year: int, month: str) -> int:
+        row = self._booked(year, month)
+        return int(row['bookings']) if row is not None else 0
+
+    def cancellation_rate(self, country: str = None) -> float:
+        if country is None:
+            return self.total_canceled / self.total_bookings * 100
+        row = self.by_country.loc[country]
+        return row.get(1, 0) / row.sum() * 100
+
+    def top_cancellation_country(self) -> tuple:
+        canceled = self.by_country[1]
+        return str(canceled.idxmax()), int(canceled.max())
+
+
+# A test case: {"class", "query", "expected"}, where expected is a function of the
+# oracle or "qualitative" (printed for manual review)
+def basic_suite() -> List[Dict]:
+    return [
+        {"class": "revenue_by_month", "query": "What’s the total revenue for July 2016?",
+         "expected": lambda o: {"Total Revenue": f"${o.month_revenue(2016, 'July'):.2f}", "Month": "July", "Year": "2016"}},
+        {"class": "cancellation_rate", "query": "What’s the cancellation rate?",
+         "expected": lambda o: {"Cancellation Rate": f"{o.cancellation_rate():.2f}%"}},
+        {"class": "top_cancellations", "query": "Which country has the highest booking cancellations?",
+         "expected": lambda o: dict(zip(["Location with Highest Cancellations", "Total Cancellations"],
+                                        o.top_cancellation_country()))},
+        {"class": "qualitative", "query": "Why do people cancel bookings?", "expected": "qualitative"},
+        {"class": "qualitative", "query": "What’s the busiest month for bookings?", "expected": "qualitative"},
+    ]
+
+
+# Every month/year and every country, on top of the basic suite
+def full_suite(oracle: Oracle, min_country_bookings: int = 1) -> List[Dict]:
+    cases = basic_suite()
+    for year, month in oracle.months():
+        cases.append({"class": "revenue_by_month", "query": f"What’s the total revenue for {month} {year}?",
+                      "expected": lambda o, y=year, m=month: {"Total Revenue": f"${o.month_revenue(y, m):.2f}",
+                                                              "Month": m, "Year": str(y)}})
+        cases.append({"class": "bookings_by_month", "query": f"How many bookings were there in {month} {year}?",
+                      "expected": lambda o, y=year, m=month: {"Total Bookings": o.month_bookings(y, m),
+                                                              "Month": m, "Year": str(y)}})
+    for country in oracle.countries(min_country_bookings):
+        if not re.fullmatch(r'[A-Z]{3}', country):  # only ISO codes can be named in a question
+            continue
+        cases.append({"class": "cancellation_rate_by_country",
+                      "query": f"What’s the cancellation rate for bookings from {country}?",
+                      "expected": lambda o, c=country: {"Cancellation Rate": f"{o.cancellation_rate(c):.2f}%",
+                                                        "Country": c}})
+    return cases
+
+
+# Question -> answer dict, over HTTP (one session per thread) or in-process
+def api_client(url: str, timeout: float) -> Callable:
+    import requests
+    local = threading.local()
+
+    def ask(query: str) -> dict:
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        response = local.session.post(url, json={"question": query}, timeout=timeout)
         if response.status_code != 200:
-            return {"query": query, "status": "error", "response": response.text}
-        actual = response.json()
-        print(f"API Response: {actual}")
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text}")
+        return response.json()
+    return ask
+
+
+def evaluate_query(ask: Callable, case: Dict, oracle: Oracle) -> Dict:
+    result = {"class": case["class"], "query": case["query"]}
+    start = time.perf_counter()
+    try:
+        actual = ask(case["query"])
     except Exception as e:
-        return {"query": query, "status": "error", "response": str(e)}
-
-    if callable(expected):  # Quantitative check
-        expected_output = expected(data)
-        is_correct = actual == expected_output
-        return {"query": query, "status": "pass" if is_correct else "fail", "expected": expected_output, "actual": actual}
-    else:  # Qualitative check
-        return {"query": query, "status": "review", "response": actual}
-
-def run_evaluation():
-    results = []
-    for test in TEST_QUERIES:
-        result = evaluate_query(test["query"], test["expected"])
-        results.append(result)
-        print(f"Query: {result['query']}")
-        if result["status"] == "review":
-            print(f"Response (review manually): {result['response']}")
+        return {**result, "status": "error", "latency": time.perf_counter() - start, "response": str(e)}
+    result["latency"] = time.perf_counter() - start
+
+    if callable(case["expected"]):  # Quantitative check
+        expected = case["expected"](oracle)
+        return {**result, "status": "pass" if actual == expected else "fail", "expected": expected, "actual": actual}
+    return {**result, "status": "review", "response": actual}  # Qualitative check
+
+
+def run_evaluation(ask: Callable, cases: List[Dict], oracle: Oracle, workers: int = 8) -> List[Dict]:
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda case: evaluate_query(ask, case, oracle), cases))
+
+
+# Accuracy and latency per query class
+def summarize(results: List[Dict]) -> Dict:
+    summary = {}
+    for name in sorted({r["class"] for r in results}):
+        group = [r for r in results if r["class"] == name]
+        counts = {status: sum(r["status"] == status for r in group) for status in ("pass", "fail", "error", "review")}
+        graded = counts["pass"] + counts["fail"] + counts["error"]
+        ms = np.array([r["latency"] for r in group]) * 1000
+        summary[name] = {"queries": len(group), **counts,
+                         "accuracy": counts["pass"] / graded if graded else None,
+                         "p50_ms": float(np.percentile(ms, 50)), "p95_ms": float(np.percentile(ms, 95))}
+    return summary
+
+
+def print_report(results: List[Dict], summary: Dict, show_failures: int):
+    print(f"{'class':<30} {'n':>5} {'pass':>5} {'fail':>5} {'err':>5} {'accuracy':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, s in summary.items():
+        accuracy = f"{s['accuracy'] * 100:.1f}%" if s['accuracy'] is not None else "review"
+        print(f"{name:<30} {s['queries']:>5} {s['pass']:>5} {s['fail']:>5} {s['error']:>5} "
+              f"{accuracy:>9} {s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f}")
+    for result in [r for r in results if r["status"] in ("fail", "error")][:show_failures]:
+        print("-" * 50)
+        print(f"Query: {result['query']} [{result['status']}]")
+        if result["status"] == "fail":
+            print(f"Expected: {result['expected']}")
+            print(f"Actual: {result['actual']}")
         else:
-            print(f"Status: {result['status']}")
-            if result["status"] == "fail":
-                print(f"Expected: {result['expected']}")
-                print(f"Actual: {result['actual']}")
+            print(f"Error: {result['response']}")
+    for result in [r for r in results if r["status"] == "review"]:
         print("-" * 50)
-    return results
+        print(f"Query: {result['query']}")
+        print(f"Response (review manually): {result['response']}")
+
 
 if __name__ == "__main__":
-    print("Running Q&A Accuracy Evaluation...")
-    run_evaluation()
+    parser = argparse.ArgumentParser(description="Check /ask answers against ground truth")
+    parser.add_argument('--mode', choices=['api', 'inprocess'], default='api',
+                        help="ask a running API, or call the booking engine in this process")
+    parser.add_argument('--url', default=BASE_URL)
+    parser.add_argument('--suite', choices=['basic', 'full'], default='basic',
+                        help="full adds a question per month/year and per country")
+    parser.add_argument('--min-country-bookings', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=8, help="questions in flight at once")
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--show-failures', type=int, default=10)
+    parser.add_argument('--output', help="write per-query results and the summary as JSON")
+    args = parser.parse_args()
+
+    print("Loading data...")
+    if args.mode == 'inprocess':
+        from booking_engine import BookingEngine
+        ask = BookingEngine().load().ask
+    else:
+        ask = api_client(args.url, args.timeout)
+    oracle = Oracle(load_bookings(columns=ORACLE_COLUMNS))
+    cases = basic_suite() if args.suite == 'basic' else full_suite(oracle, args.min_country_bookings)
+
+    print(f"Running Q&A Accuracy Evaluation ({len(cases)} queries, {args.workers} workers)...")
+    start = time.perf_counter()
+    results = run_evaluation(ask, cases, oracle, args.workers)
+    elapsed = time.perf_counter() - start
+    summary = summarize(results)
+    print_report(results, summary, args.show_failures)
+    print(f"Evaluated {len(results)} queries in {elapsed:.1f}s")
 
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"mode": args.mode, "suite": args.suite, "elapsed": elapsed, "summary": summary,
+                       "results": results}, f, indent=2, default=str)
+        print(f"Saved results to '{args.output}'.")
+    sys.exit(1 if any(r["status"] in ("fail", "error") for r in results) else 0)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# File: faiss_index.py
+import argparse
+import json
+import os
+import time
+
+import faiss
+import numpy as np
+
+from columnar_store import STORE_PATH, has_store, load_bookings, load_embeddings
+
+INDEX_PATH = 'hotel_booking_index.faiss'
+MODEL_NAME = 'all-MiniLM-L6-v2'
+INDEX_TYPES = ['flat', 'ivf_flat', 'ivf_pq', 'hnsw']
+K = 5
+
+
+# Search-time parameters live next to the index as <index>.json
+def meta_path(index_path: str) -> str:
+    return index_path + '.json'
+
+
+def embed_texts(texts, batch_size: int = 256) -> np.ndarray:
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(MODEL_NAME)
+    batches = []
+    for start in range(0, len(texts), batch_size):
+        batches.append(model.encode(texts[start:start + batch_size]).astype('float32'))
+        print(f"Embedded {min(start + batch_size, len(texts))}/{len(texts)} rows")
+    return np.vstack(batches)
+
+
+def build_index(embeddings: np.ndarray, index_type: str = 'flat', nlist: int = 1024, pq_m: int = 16,
+                pq_bits: int = 8, hnsw_m: int = 32, ef_construction: int = 200):
+    dim = embeddings.shape[1]
+    if index_type == 'flat':
+        index = faiss.IndexFlatL2(dim)
+    elif index_type in ('ivf_flat', 'ivf_pq'):
+        # IVF needs enough training points per list; shrink nlist for small datasets
+        nlist = max(1, min(nlist, len(embeddings) // 39))
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == 'ivf_flat':
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_bits)
+        index.train(embeddings)
+    elif index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+    else:
+        raise ValueError(f"Unknown index type '{index_type}'. Options: {', '.join(INDEX_TYPES)}")
+    index.add(embeddings)
+    return index
+
+
+# Name of the search-time knob for each index type (None for exact search)
+def search_param_name(index_type: str):
+    return {'ivf_flat': 'nprobe', 'ivf_pq': 'nprobe', 'hnsw': 'efSearch'}.get(index_type)
+
+
+def apply_search_params(index, params: dict):
+    space = faiss.ParameterSpace()
+    for name, value in params.items():
+        space.set_index_parameter(index, name, value)
+
+
+# Search restricted to the given row ids with an ID selector, keeping the index's own
+# nprobe/efSearch (per-call SearchParameters would otherwise reset them)
+def search_ids(index, queries: np.ndarray, k: int, ids: np.ndarray):
+    selector = faiss.IDSelectorBatch(np.ascontiguousarray(ids, dtype=np.int64))
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+    elif isinstance(index, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    return index.search(queries, k, params=params)
+
+
+def evaluate(index, queries: np.ndarray, truth: np.ndarray, k: int = K) -> dict:
+    _, found = index.search(queries, k)
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    latencies = []
+    for row in range(len(queries)):
+        start = time.perf_counter()
+        index.search(queries[row:row + 1], k)
+        latencies.append(time.perf_counter() - start)
+    return {"recall@5": float(recall),
+            "p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "p99_ms": float(np.percentile(latencies, 99) * 1000)}
+
+
+# Try increasing nprobe/efSearch and keep the cheapest setting that reaches target_recall
+def tune(index, index_type: str, queries: np.ndarray, truth: np.ndarray, target_recall: float) -> tuple:
+    name = search_param_name(index_type)
+    if name is None:
+        return {}, evaluate(index, queries, truth)
+    limit = index.nlist if name == 'nprobe' else 1024
+    best = None
+    for value in [v for v in (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024) if v <= limit]:
+        apply_search_params(index, {name: value})
+        report = evaluate(index, queries, truth)
+        print(f"  {name}={value}: recall@5={report['recall@5']:.3f} "
+              f"p50={report['p50_ms']:.2f}ms p99={report['p99_ms']:.2f}ms")
+        best = ({name: value}, report)
+        if report['recall@5'] >= target_recall:
+            break
+    apply_search_params(index, best[0])
+    return best
+
+
+def save_index(index, index_type: str, params: dict, report: dict, path: str = INDEX_PATH):
+    faiss.write_index(index, path)
+    with open(meta_path(path), 'w') as f:
+        json.dump({"index_type": index_type, "search_params": params, "report": report}, f, indent=2)
+
+
+# Load an index and apply the search parameters stored by save_index (if any).
+# With mmap=True the index data is memory-mapped read-only where the index type
+# supports it, so several processes share the same pages.
+def load_index(path: str = INDEX_PATH, mmap: bool = False):
+    index = None
+    if mmap:
+        try:
+            index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except (AttributeError, RuntimeError):
+            index = None  # faiss build or index type without mmap support
+    if index is None:
+        index = faiss.read_index(path)
+    if os.path.exists(meta_path(path)):
+        with open(meta_path(path)) as f:
+            apply_search_params(index, json.load(f).get("search_params", {}))
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and tune the booking FAISS index")
+    parser.add_argument('--type', choices=INDEX_TYPES, default='flat')
+    parser.add_argument('--output', default=INDEX_PATH)
+    parser.add_argument('--nlist', type=int, default=1024)
+    parser.add_argument('--pq-m', type=int, default=16)
+    parser.add_argument('--pq-bits', type=int, default=8)
+    parser.add_argument('--hnsw-m', type=int, default=32)
+    parser.add_argument('--ef-construction', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--queries', type=int, default=1000, help="held-in rows used as tuning queries")
+    parser.add_argument('--target-recall', type=float, default=0.95)
+    parser.add_argument('--reuse-embeddings', action='store_true',
+                        help="use embeddings.npy from the columnar store instead of re-embedding")
+    args = parser.parse_args()
+
+    if args.reuse_embeddings and has_store(STORE_PATH):
+        embeddings = np.ascontiguousarray(load_embeddings(STORE_PATH, mmap=False))
+    else:
+        embeddings = embed_texts(load_bookings()['text'].tolist(), batch_size=args.batch_size)
+
+    index = build_index(embeddings, args.type, nlist=args.nlist, pq_m=args.pq_m, pq_bits=args.pq_bits,
+                        hnsw_m=args.hnsw_m, ef_construction=args.ef_construction)
+
+    rng = np.random.default_rng(0)
+    queries = embeddings[rng.choice(len(embeddings), min(args.queries, len(embeddings)), replace=False)]
+    exact = faiss.IndexFlatL2(embeddings.shape[1])
+    exact.add(embeddings)
+    _, truth = exact.search(queries, K)
+
+    print(f"Tuning {args.type} index on {len(queries)} queries...")
+    params, report = tune(index, args.type, queries, truth, args.target_recall)
+    save_index(index, args.type, params, report, args.output)
+    print(f"Saved {args.type} index ({index.ntotal} vectors) to '{args.output}' with {params or 'exact search'}: "
+          f"recall@5={report['recall@5']:.3f} p50={report['p50_ms']:.2f}ms p99={report['p99_ms']:.2f}ms")
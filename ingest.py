@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# File: ingest.py
+import argparse
+import os
+
+import faiss
+import numpy as np
+import pandas as pd
+
+from cleaning import clean_bookings
+from columnar_store import (STORE_PATH, append_columnar, has_store, load_bookings, parse_embeddings,
+                            save_columnar)
+from faiss_index import INDEX_PATH, embed_texts, load_index, meta_path
+
+
+# One line of retrieval text per booking, for rows that arrive without a `text` column
+def booking_text(df: pd.DataFrame) -> pd.Series:
+    status = np.where(df['is_canceled'] == 1, 'Canceled', 'Not canceled')
+    return ("Hotel: " + df['hotel'].astype(str)
+            + ", Country: " + df['country'].astype(str)
+            + ", Arrival: " + df['arrival_date'].dt.strftime('%Y-%m-%d')
+            + ", Lead time: " + df['lead_time'].astype(str) + " days"
+            + ", Nights: " + df['total_nights'].astype(str)
+            + ", ADR: " + df['adr'].round(2).astype(str)
+            + ", Revenue: " + df['revenue'].round(2).astype(str)
+            + ", Status: " + pd.Series(status, index=df.index))
+
+
+# Clean a batch of raw booking rows (same columns as hotel_bookings.csv) and give
+# them retrieval text, ready to append to the live frame
+def prepare_rows(raw: pd.DataFrame) -> pd.DataFrame:
+    rows = clean_bookings(raw)
+    if 'text' not in rows.columns:
+        rows['text'] = booking_text(rows)
+    return rows.drop(columns=['embedding'], errors='ignore')
+
+
+# Append new rows, keeping the columns (and category dtypes) of the existing frame
+def append_rows(data: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    rows = rows.reindex(columns=data.columns)
+    combined = pd.concat([data, rows], ignore_index=True)
+    for name in data.columns:
+        if isinstance(data[name].dtype, pd.CategoricalDtype):
+            combined[name] = combined[name].astype('category')
+    return combined
+
+
+# Append prepared rows and their embeddings to the on-disk store. Only the new rows are
+# read and written (see append_columnar); the first ingest into a CSV-only setup
+# converts the CSV into a store.
+def append_store(rows: pd.DataFrame, embeddings: np.ndarray, store_path: str = STORE_PATH):
+    if has_store(store_path):
+        append_columnar(rows, store_path, embeddings)
+        return
+    data = load_bookings(store_path)
+    all_embeddings = np.vstack([parse_embeddings(data['embedding']), embeddings]) \
+        if 'embedding' in data.columns else None
+    data = append_rows(data.drop(columns=['embedding'], errors='ignore'), rows)
+    tmp_path = store_path + '.tmp'
+    save_columnar(data, tmp_path, all_embeddings)
+    os.replace(tmp_path, store_path)
+
+
+# Replace the index file atomically; search params in meta_path(index_path) are unchanged
+def write_index(index, index_path: str = INDEX_PATH):
+    faiss.write_index(index, index_path + '.tmp')
+    os.replace(index_path + '.tmp', index_path)
+
+
+# Offline path: append to the on-disk store and index
+def ingest_files(raw: pd.DataFrame, store_path: str = STORE_PATH, index_path: str = INDEX_PATH) -> int:
+    rows = prepare_rows(raw)
+    new_embeddings = embed_texts(rows['text'].tolist())
+    append_store(rows, new_embeddings, store_path)
+    index = load_index(index_path)
+    index.add(new_embeddings)
+    write_index(index, index_path)
+    return len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append new raw booking rows without a full rebuild")
+    parser.add_argument('csv', help="raw booking rows with the columns of hotel_bookings.csv")
+    parser.add_argument('--api', help="base URL of a running API (e.g. http://127.0.0.1:8000); "
+                                      "send the rows to its /ingest endpoint instead of updating files")
+    parser.add_argument('--store', default=STORE_PATH)
+    parser.add_argument('--index', default=INDEX_PATH)
+    args = parser.parse_args()
+
+    raw = pd.read_csv(args.csv)
+    if args.api:
+        import requests
+        payload = {"rows": raw.astype(object).where(raw.notna(), None).to_dict(orient='records')}
+        response = requests.post(args.api.rstrip('/') + '/ingest', json=payload)
+        print(f"API Status Code: {response.status_code}")
+        print(response.json())
+    else:
+        count = ingest_files(raw, args.store, args.index)
+        print(f"Appended {count} rows to '{args.store}' and '{args.index}' "
+              f"(search parameters kept from '{meta_path(args.index)}').")
@@ -0,0 +1,346 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# File: llm_client.py
+import asyncio
+import hashlib
+import os
+import random
+import threading
+import time
+
+# Upstream errors worth another attempt (google.api_core exception class names),
+# besides timeouts and connection errors
+RETRYABLE_ERRORS = {'ResourceExhausted', 'ServiceUnavailable', 'InternalServerError', 'DeadlineExceeded',
+                    'TooManyRequests', 'GatewayTimeout', 'Unknown'}
+
+
+# Raised when no answer could be produced in time: circuit open, too many calls in
+# flight, deadline passed or retries used up. Callers fall back to retrieval-only answers.
+class LLMUnavailable(Exception):
+    pass
+
+
+def is_retryable(exc: Exception) -> bool:
+    return isinstance(exc, (TimeoutError, asyncio.TimeoutError, ConnectionError)) \
+        or type(exc).__name__ in RETRYABLE_ERRORS
+
+
+# Backends produce text for a prompt; `stream` variants yield chunks as they arrive.
+# Each gets the time left on the call's deadline as `timeout`.
+class GeminiBackend:
+    name = 'gemini'
+
+    def __init__(self, model_name: str = 'gemini-2.0-flash', system_instruction: str = None):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self._model = None
+        self._lock = threading.Lock()
+
+    # Imported and configured on first use
+    def load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import google.generativeai as genai
+                    genai.configure(api_key=os.getenv("GEMINI_API_KEY", "your_gemini_key"))  # Replace with your key
+                    self._model = genai.GenerativeModel(self.model_name, system_instruction=self.system_instruction)
+        return self._model
+
+    async def generate(self, prompt: str, timeout: float) -> str:
+        response = await self.load().generate_content_async(prompt, request_options={"timeout": timeout})
+        return response.text if response and response.text else ""
+
+    async def stream(self, prompt: str, timeout: float):
+        response = await self.load().generate_content_async(prompt, stream=True, request_options={"timeout": timeout})
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    def generate_sync(self, prompt: str, timeout: float) -> str:
+        response = self.load().generate_content(prompt, request_options={"timeout": timeout})
+        return response.text if response and response.text else ""
+
+    def stream_sync(self, prompt: str, timeout: float):
+        for chunk in self.load().generate_content(prompt, stream=True, request_options={"timeout": timeout}):
+            if chunk.text:
+                yield chunk.text
+
+
+# Deterministic offline backend for tests and benchmarks: the answer depends only on
+# the prompt, after an optional fixed latency
+class StubBackend:
+    name = 'stub'
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def load(self):
+        return self
+
+    def _answer(self, prompt: str) -> str:
+        digest = hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:12]
+        return f"Offline answer {digest}"
+
+    async def generate(self, prompt: str, timeout: float) -> str:
+        await asyncio.sleep(self.latency)
+        return self._answer(prompt)
+
+    async def stream(self, prompt: str, timeout: float):
+        await asyncio.sleep(self.latency)
+        for word in self._answer(prompt).split():
+            yield word + " "
+
+    def generate_sync(self, prompt: str, timeout: float) -> str:
+        time.sleep(self.latency)
+        return self._answer(prompt)
+
+    def stream_sync(self, prompt: str, timeout: float):
+        time.sleep(self.latency)
+        for word in self._answer(prompt).split():
+            yield word + " "
+
+
+BACKENDS = ('gemini', 'stub')
+
+
+def make_backend(name: str, system_instruction: str = None):
+    if name == 'gemini':
+        return GeminiBackend(system_instruction=system_instruction)
+    if name == 'stub':
+        return StubBackend(latency=float(os.getenv("LLM_STUB_LATENCY", "0")))
+    raise ValueError(f"Unknown LLM backend '{name}'. Options: {', '.join(BACKENDS)}")
+
+
+# Opens after `failure_threshold` consecutive failures and rejects calls for
+# `reset_timeout` seconds; then lets a single trial call through (half-open) and
+# closes again if it succeeds.
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = 'half_open'
+            if self.state == 'half_open':
+                if self._trial:
+                    return False
+                self._trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state, self.failures, self._trial = 'closed', 0, False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state, self.opened_at = 'open', time.monotonic()
+            self._trial = False
+
+    # A call that was let through ended without an outcome (e.g. cancelled)
+    def release(self):
+        with self._lock:
+            self._trial = False
+
+
+# Calls a backend with a deadline per call (shared by all its attempts), at most
+# `concurrency` calls in flight, retries with full-jitter exponential backoff and a
+# circuit breaker. Async methods serve the API; *_sync methods serve Streamlit.
+class LLMClient:
+    def __init__(self, backend, timeout: float = 20.0, max_retries: int = 2, backoff: float = 0.5,
+                 max_backoff: float = 4.0, concurrency: int = 8, breaker: CircuitBreaker = None):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.concurrency = concurrency
+        self.breaker = breaker or CircuitBreaker()
+        self._async_slots = asyncio.Semaphore(concurrency)
+        self._sync_slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self.counts = {"calls": 0, "retries": 0, "timeouts": 0, "failures": 0, "rejected": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _remaining(self, deadline: float) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMUnavailable(f"LLM deadline of {self.timeout}s exceeded")
+        return remaining
+
+    def _admit(self):
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise LLMUnavailable("LLM circuit breaker is open")
+
+    def _reject_busy(self):
+        self._count("rejected")
+        raise LLMUnavailable(f"More than {self.concurrency} LLM calls in flight")
+
+    # Record a failed attempt; returns the backoff delay if another attempt fits the deadline
+    def _failed(self, exc: Exception, attempt: int, deadline: float, started: bool = False):
+        self.breaker.record_failure()
+        self._count("timeouts" if isinstance(exc, (TimeoutError, asyncio.TimeoutError)) else "failures")
+        if started or attempt >= self.max_retries or not is_retryable(exc):
+            raise LLMUnavailable(f"LLM call failed: {exc!r}") from exc
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            raise LLMUnavailable(f"LLM call failed: {exc!r}") from exc
+        self._count("retries")
+        return delay
+
+    async def generate(self, prompt: str) -> str:
+        self._count("calls")
+        deadline = time.monotonic() + self.timeout
+        for attempt in range(self.max_retries + 1):
+            try:
+                await asyncio.wait_for(self._async_slots.acquire(), self._remaining(deadline))
+            except asyncio.TimeoutError:
+                self._reject_busy()
+            try:
+                self._admit()
+                try:
+                    remaining = self._remaining(deadline)
+                    text = await asyncio.wait_for(self.backend.generate(prompt, remaining), remaining)
+                except LLMUnavailable:
+                    self.breaker.release()
+                    raise
+                except Exception as e:
+                    delay = self._failed(e, attempt, deadline)
+                except BaseException:
+                    self.breaker.release()
+                    raise
+                else:
+                    self.breaker.record_success()
+                    return text
+            finally:
+                self._async_slots.release()
+            await asyncio.sleep(delay)
+
+    # Retries only happen before the first chunk; a stream that fails midway raises
+    async def stream(self, prompt: str):
+        self._count("calls")
+        deadline = time.monotonic() + self.timeout
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                await asyncio.wait_for(self._async_slots.acquire(), self._remaining(deadline))
+            except asyncio.TimeoutError:
+                self._reject_busy()
+            try:
+                self._admit()
+                try:
+                    chunks = self.backend.stream(prompt, self._remaining(deadline)).__aiter__()
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), self._remaining(deadline))
+                        except StopAsyncIteration:
+                            break
+                        started = True
+                        yield chunk
+                except LLMUnavailable:
+                    self.breaker.release()
+                    raise
+                except Exception as e:
+                    delay = self._failed(e, attempt, deadline, started)
+                except BaseException:
+                    self.breaker.release()
+                    raise
+                else:
+                    self.breaker.record_success()
+                    return
+            finally:
+                self._async_slots.release()
+            await asyncio.sleep(delay)
+
+    # Blocking variants: the deadline is passed to the backend as its request timeout
+    def generate_sync(self, prompt: str) -> str:
+        self._count("calls")
+        deadline = time.monotonic() + self.timeout
+        for attempt in range(self.max_retries + 1):
+            if not self._sync_slots.acquire(timeout=self._remaining(deadline)):
+                self._reject_busy()
+            try:
+                self._admit()
+                try:
+                    text = self.backend.generate_sync(prompt, self._remaining(deadline))
+                except LLMUnavailable:
+                    self.breaker.release()
+                    raise
+                except Exception as e:
+                    delay = self._failed(e, attempt, deadline)
+                except BaseException:
+                    self.breaker.release()
+                    raise
+                else:
+                    self.breaker.record_success()
+                    return text
+            finally:
+                self._sync_slots.release()
+            time.sleep(delay)
+
+    def stream_sync(self, prompt: str):
+        self._count("calls")
+        deadline = time.monotonic() + self.timeout
+        for attempt in range(self.max_retries + 1):
+            started = False
+            if not self._sync_slots.acquire(timeout=self._remaining(deadline)):
+                self._reject_busy()
+            try:
+                self._admit()
+                try:
+                    for chunk in self.backend.stream_sync(prompt, self._remaining(deadline)):
+                        started = True
+                        yield chunk
+                except LLMUnavailable:
+                    self.breaker.release()
+                    raise
+                except Exception as e:
+                    delay = self._failed(e, attempt, deadline, started)
+                except BaseException:
+                    self.breaker.release()
+                    raise
+                else:
+                    self.breaker.record_success()
+                    return
+            finally:
+                self._sync_slots.release()
+            time.sleep(delay)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        return {"backend": self.backend.name, "breaker": self.breaker.state, **counts}
+
+
+# Client configured from LLM_* environment variables (shared by api.py and app.py)
+def client_from_env(system_instruction: str = None) -> LLMClient:
+    return LLMClient(make_backend(os.getenv("LLM_BACKEND", "gemini"), system_instruction),
+                     timeout=float(os.getenv("LLM_TIMEOUT", "20")),
+                     max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+                     concurrency=int(os.getenv("LLM_CONCURRENCY", "8")),
+                     breaker=CircuitBreaker(failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+                                            reset_timeout=float(os.getenv("LLM_BREAKER_RESET", "30"))))
+
+
+# Degraded mode: when the LLM is unavailable, answer with the retrieved context itself
+def retrieval_only_answer(context_data: str) -> dict:
+    return {"answer": "The language model is unavailable right now; these are the most relevant bookings.",
+            "context": context_data, "degraded": True}
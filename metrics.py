@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# File: metrics.py
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+# Per-request {stage: seconds}, set by the API middleware when a timing header is requested
+request_timings = ContextVar('request_timings', default=None)
+# Per-request {name: value} for other sizes (e.g. prompt tokens), sent back as X-<Name> headers
+request_values = ContextVar('request_values', default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+# Latency histograms keyed by metric name and label values, rendered in the
+# Prometheus text exposition format
+class Metrics:
+    def __init__(self, prefix: str = 'booking_api'):
+        self.prefix = prefix
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, buckets=BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = Histogram(buckets)
+            self._histograms[key].observe(value)
+
+    # Observe a value into <prefix>_<name> and the current request's values
+    def record(self, name: str, value: float, buckets=BUCKETS):
+        self.observe(name, value, buckets=buckets)
+        values = request_values.get()
+        if values is not None:
+            values[name] = value
+
+    # Time a stage into <prefix>_stage_seconds{stage=...} and the current request's timings
+    @contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe('stage_seconds', elapsed, stage=stage)
+            timings = request_timings.get()
+            if timings is not None:
+                timings[stage] = timings.get(stage, 0.0) + elapsed
+
+    @staticmethod
+    def _labels(pairs) -> str:
+        return ','.join(f'{k}="{v}"' for k, v in pairs)
+
+    # `gauges` maps metric name -> value, or -> {label value tuple: value} with `labels` names
+    def render(self, gauges: dict = None) -> str:
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            seen = set()
+            for (name, labels), hist in histograms:
+                full = f'{self.prefix}_{name}'
+                if full not in seen:
+                    lines.append(f'# TYPE {full} histogram')
+                    seen.add(full)
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    lines.append(f'{full}_bucket{{{self._labels(labels + (("le", bound),))}}} {cumulative}')
+                lines.append(f'{full}_bucket{{{self._labels(labels + (("le", "+Inf"),))}}} {hist.count}')
+                suffix = f'{{{self._labels(labels)}}}' if labels else ''
+                lines.append(f'{full}_sum{suffix} {hist.sum}')
+                lines.append(f'{full}_count{suffix} {hist.count}')
+        for name, value in (gauges or {}).items():
+            full = f'{self.prefix}_{name}'
+            lines.append(f'# TYPE {full} gauge')
+            if isinstance(value, dict):
+                for labels, v in value.items():
+                    lines.append(f'{full}{{{self._labels(labels)}}} {v}')
+            else:
+                lines.append(f'{full} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+# Current resident set size of this process (peak RSS where /proc is unavailable)
+def resident_bytes() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux, bytes on macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def value_headers(values: dict) -> dict:
+    return {'X-' + name.replace('_', '-').title(): str(value) for name, value in values.items()}
+
+
+def server_timing(timings: dict) -> str:
+    return ', '.join(f'{stage};dur={seconds * 1000:.2f}' for stage, seconds in timings.items())
@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# File: query_engine.py
+import re
+
+import pandas as pd
+
+from analytics_cube import MONTH_NAMES
+
+# Common country names -> ISO 3166 alpha-3 codes used in the dataset
+COUNTRY_NAMES = {
+    'portugal': 'PRT', 'united kingdom': 'GBR', 'uk': 'GBR', 'britain': 'GBR', 'england': 'GBR',
+    'france': 'FRA', 'spain': 'ESP', 'germany': 'DEU', 'italy': 'ITA', 'ireland': 'IRL',
+    'belgium': 'BEL', 'brazil': 'BRA', 'netherlands': 'NLD', 'holland': 'NLD', 'united states': 'USA',
+    'usa': 'USA', 'switzerland': 'CHE', 'china': 'CHN', 'austria': 'AUT',
+    'sweden': 'SWE', 'poland': 'POL', 'russia': 'RUS', 'norway': 'NOR', 'romania': 'ROU',
+    'finland': 'FIN', 'denmark': 'DNK', 'australia': 'AUS', 'morocco': 'MAR', 'luxembourg': 'LUX',
+    'israel': 'ISR', 'turkey': 'TUR', 'india': 'IND', 'japan': 'JPN', 'canada': 'CAN',
+}
+# Hotel slot patterns; a bare "city" is a place, not the City Hotel
+HOTELS = {r'resort( hotels?)?': 'Resort Hotel', r'city hotels?': 'City Hotel'}
+
+# Keyword patterns -> metric, checked in order (first match wins)
+METRIC_PATTERNS = [
+    ('cancellation_rate', r'\bcancell?ation rates?\b|\bcancel rates?\b|\b(percent(age)?|share|proportion)\b.*\bcancel'),
+    ('average_revenue', r'\baverage price\b|\b(average|avg|mean|typical)\b.*\brevenue\b|\brevenue per booking\b'),
+    ('revenue', r'\b(revenue|income|earn(ed|ings|s)?)\b'),
+    ('lead_time', r'\blead times?\b'),
+    ('adr', r'\badr\b|\bdaily rate\b|\bprice per night\b|\bnightly rate\b'),
+    ('nights', r'\blength of stay\b|\b(average|typical|how long)\b.*\b(stay|stays|nights)\b'),
+    ('cancellations', r'\bcancel(l?ations?|l?ed|s)?\b'),
+    ('bookings', r'\b(busiest|bookings|reservations|how many)\b'),
+]
+# A question is only compiled to an aggregate when it asks for a quantity...
+AGGREGATE_CUES = (r"\b(how many|how much|number of|count|total|sum|rate|average|avg|mean|typical|"
+                  r"percent(age)?|share|proportion|top \d+|highest|lowest|most|least|fewest|busiest|quietest|"
+                  r"by|per|each|every)\b|\bwhat(?:'s| is| was) the\b")
+# ...and doesn't ask for an explanation; those go to retrieval + LLM
+QUALITATIVE_CUES = (r"\b(why|how come|explain|describe|reasons?|factors?|causes?|drivers?|affects?|affected|"
+                    r"impacts?|influences?|insights?|characteristics|profile|patterns?|behaviou?r|what makes)\b"
+                    r"|trend|over time")
+# Conditions, statistics and dimensions a spec cannot represent: answering without
+# them would return a confident number for a different question
+UNSUPPORTED_CUES = (r"\b(less|more|fewer|greater|longer|shorter|higher|lower|bigger|smaller) than\b"
+                    r"|\b(at least|at most|over|under|above|below|between|within|exceeding|up to)\s+\$?\d"
+                    r"|[<>]|\b(days|weeks|months) (before|after|in advance|ahead)\b"
+                    r"|\b(median|mode|min(imum)?|max(imum)?|standard deviation|variance|percentiles?|distribution)\b"
+                    r"|\b(child(ren)?|kids?|bab(y|ies)|adults?|guests?|famil(y|ies)|market|segments?|channels?|"
+                    r"customers?|customer types?|rooms?|meals?|deposits?|agents?|agenc(y|ies)|compan(y|ies)|"
+                    r"repeat(ed)?|returning|special requests?|parking|waiting list|weekends?|weekdays?|"
+                    r"weeks?|quarters?|seasons?|cit(y|ies)(?! hotels?)|regions?|continents?|europe(an)?|"
+                    r"asia(n)?|africa(n)?|america(n|s)?|oceania|middle east|scandinavia(n)?|latin)\b")
+# Words that may follow by/per/each/every or which: a dimension, or a metric
+# ("top 5 countries by revenue", "revenue per booking")
+GROUP_WORDS = (r"countr(y|ies)|locations?|nationality|months?|hotels?|years?|bookings?|reservations?|"
+               r"nights?|stays?|revenue|income|cancell?ations?|cancel|lead|adr|rates?|price|average|total|"
+               r"count|number|volume|one|of")
+PERCENT_CUES = r"\b(percent(age)?|share|proportion|fraction|ratio)\b|%"
+# Metrics that only count bookings that were not canceled unless asked otherwise
+BOOKED_ONLY = {'revenue', 'average_revenue', 'adr', 'nights', 'bookings'}
+
+DIMENSIONS = {'country': r'countr(y|ies)|locations?|nationality', 'month': r'months?',
+              'hotel': r'hotels?|hotel type', 'year': r'years?'}
+DIMENSION_LABELS = {'country': 'Location', 'month': 'Month', 'hotel': 'Hotel', 'year': 'Year'}
+METRIC_LABELS = {'cancellation_rate': 'Cancellation Rate', 'average_revenue': 'Average Revenue per Booking',
+                 'revenue': 'Revenue', 'lead_time': 'Average Lead Time (days)', 'adr': 'Average Daily Rate',
+                 'nights': 'Average Stay (nights)', 'cancellations': 'Cancellations', 'bookings': 'Bookings'}
+
+
+def _find_month(question: str):
+    for number, name in enumerate(MONTH_NAMES, start=1):
+        if name == 'May':
+            # "may" is also a verb; only take it next to a year or after in/for/during
+            if re.search(r'\bMay\s+\d{4}\b|\b(in|for|during)\s+may\b', question, re.IGNORECASE):
+                return number
+        elif re.search(rf'\b{name}\b', question, re.IGNORECASE):
+            return number
+    return None
+
+
+def _find_country(question: str, known_countries):
+    lower = question.lower()
+    for name, code in COUNTRY_NAMES.items():
+        if re.search(rf'\b{name}\b', lower):
+            return code
+    known = set(known_countries)
+    for token in re.findall(r'\b[A-Z]{3}\b', question):
+        if token in known:
+            return token
+    return None
+
+
+# Slot filters named in a question: year, month, country, hotel and (when stated
+# explicitly) canceled / not canceled. Shared by the query engine and filtered retrieval.
+def extract_filters(question: str, known_countries=()) -> dict:
+    lower = question.lower().replace('’', "'")
+    filters = {}
+    year = re.search(r'\b(20\d{2})\b', lower)
+    if year:
+        filters['year'] = int(year.group(1))
+    month = _find_month(question)
+    if month:
+        filters['month'] = month
+    country = _find_country(question, known_countries)
+    if country:
+        filters['country'] = country
+    for pattern, hotel in HOTELS.items():
+        if re.search(rf'\b{pattern}\b', lower):
+            filters['hotel'] = hotel
+    if re.search(r'\b(not|non|un)[- ]?cancell?ed\b', lower):
+        filters['is_canceled'] = 0
+    elif re.search(r'\bcancell?ed (bookings|reservations|stays)\b', lower):
+        filters['is_canceled'] = 1
+    return filters
+
+
+# Turn extracted filters into FilterIndex.select arguments (year/month -> date range)
+def select_args(filters: dict) -> dict:
+    args = {name: filters[name] for name in ('country', 'hotel', 'is_canceled') if name in filters}
+    year, month = filters.get('year'), filters.get('month')
+    if year is not None:
+        start = pd.Timestamp(year=year, month=month or 1, day=1)
+        end = start + (pd.offsets.MonthEnd(0) if month else pd.offsets.YearEnd(0))
+        args['start'], args['end'] = start, end
+    return args
+
+
+# The filters select_args applies (a month only counts with a year); anything else
+# would be shown to the LLM without restricting the rows
+def applied_filters(filters: dict) -> dict:
+    return {name: value for name, value in filters.items()
+            if name in ('country', 'hotel', 'is_canceled', 'year') or (name == 'month' and 'year' in filters)}
+
+
+# Capitalised places after in/from/for/at that are not a known country, month or
+# hotel (e.g. "South America"); filtering on nothing would answer for everywhere
+def _unknown_place(question: str, known_countries) -> bool:
+    for match in re.finditer(r'\b(?:in|from|for|at)\s+(?:the\s+)?([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)', question):
+        phrase = match.group(1)
+        if any(word in MONTH_NAMES for word in phrase.split()) or re.search(r'hotel|resort', phrase, re.IGNORECASE):
+            continue
+        if _find_country(phrase, known_countries) is None:
+            return True
+    return False
+
+
+# Compile a question into an aggregate spec:
+#   {"metric", "filters": {country/hotel/month/year/is_canceled}, "group_by", "top_k", "ascending"}
+# Returns None for questions the engine cannot answer (left to retrieval + LLM).
+def parse_question(question: str, known_countries=()):
+    lower = question.lower().replace('’', "'")
+    if re.search(QUALITATIVE_CUES, lower) or not re.search(AGGREGATE_CUES, lower):
+        return None
+    if re.search(UNSUPPORTED_CUES, lower) or _unknown_place(question, known_countries):
+        return None
+    # Group-bys and "which ..." must name a dimension the group index has
+    for match in re.finditer(r'\b(?:by|per|each|every|which)\s+(?:(?:the|each|every)\s+)?(\w+)', lower):
+        if not re.fullmatch(GROUP_WORDS, match.group(1)):
+            return None
+
+    metric = next((name for name, pattern in METRIC_PATTERNS if re.search(pattern, lower)), None)
+    if metric is None:
+        return None
+    # The only percentage a spec computes is the cancellation rate
+    if metric != 'cancellation_rate' and re.search(PERCENT_CUES, lower):
+        return None
+
+    filters = extract_filters(question, known_countries)
+    if 'is_canceled' not in filters and metric in BOOKED_ONLY and re.search(r'\bcancell?ed\b', lower):
+        filters['is_canceled'] = 1
+
+    group_by, top_k, ascending = None, None, False
+    top = re.search(r'\btop\s+(\d+)\b', lower)
+    for dim, pattern in DIMENSIONS.items():
+        if dim in filters or not re.search(rf'\b({pattern})\b', lower):
+            continue
+        # "by year" asks for a breakdown, even in a "what ..." question
+        if re.search(rf'\b(by|per|each|every)\s+({pattern})\b', lower):
+            group_by = dim
+            top_k = int(top.group(1)) if top else None
+        elif re.search(rf'\b(which|what|busiest|quietest|highest|lowest|most|least|fewest|top)\b.*\b({pattern})\b', lower) \
+                or re.search(rf'\b({pattern})\b.*\b(highest|lowest|most|least|fewest)\b', lower):
+            group_by = dim
+            top_k = int(top.group(1)) if top else 1
+        if group_by:
+            ascending = bool(re.search(r'\b(lowest|least|fewest|quietest)\b', lower))
+            break
+
+    return {"metric": metric, "filters": filters, "group_by": group_by, "top_k": top_k, "ascending": ascending}
+
+
+def _measure(sums: pd.DataFrame, metric: str) -> pd.Series:
+    bookings = sums['bookings'].where(sums['bookings'] > 0)
+    if metric == 'bookings':
+        return sums['bookings']
+    if metric == 'cancellations':
+        return sums['canceled']
+    if metric == 'cancellation_rate':
+        return sums['canceled'] / bookings * 100
+    if metric == 'revenue':
+        return sums['revenue']
+    if metric == 'average_revenue':
+        return sums['revenue'] / bookings
+    return sums[metric] / bookings  # lead_time, adr, nights: averages per booking
+
+
+# Filters a spec applies to the group index (booked-only metrics exclude cancellations)
+def _applied_filters(spec: dict) -> dict:
+    filters = dict(spec['filters'])
+    if spec['metric'] in BOOKED_ONLY:
+        filters.setdefault('is_canceled', 0)
+    return filters
+
+
+def _subset(groups: pd.DataFrame, filters: dict) -> pd.DataFrame:
+    mask = pd.Series(True, index=groups.index)
+    for column, value in filters.items():
+        mask &= groups[column] == value
+    return groups[mask]
+
+
+def _aggregate(spec: dict, subset: pd.DataFrame):
+    columns = ['bookings', 'canceled', 'revenue', 'lead_time', 'adr', 'nights']
+    if spec['group_by'] is None:
+        return float(_measure(subset[columns].sum().to_frame().T, spec['metric']).iloc[0])
+    values = _measure(subset.groupby(spec['group_by'])[columns].sum(), spec['metric']).dropna()
+    values = values.sort_values(ascending=spec['ascending'], kind='stable')
+    return values.head(spec['top_k']) if spec['top_k'] else values
+
+
+# Evaluate a spec against the cube's group index. Returns a float, or a Series of
+# values per group (ordered and cut to top_k) when the spec has a group_by.
+def run_query(spec: dict, cube):
+    return _aggregate(spec, _subset(cube.groups, _applied_filters(spec)))
+
+
+def _format_value(metric: str, value):
+    if metric in ('bookings', 'cancellations'):
+        return int(value)
+    if metric == 'cancellation_rate':
+        return f"{value:.2f}%"
+    if metric in ('revenue', 'average_revenue', 'adr'):
+        return f"${value:.2f}"
+    return f"{value:.1f}"
+
+
+def _format_key(dim: str, key) -> str:
+    return MONTH_NAMES[int(key) - 1] if dim == 'month' else str(key)
+
+
+def format_answer(spec: dict, result) -> dict:
+    metric, dim = spec['metric'], spec['group_by']
+    label = METRIC_LABELS[metric]
+    if dim is None:
+        answer = {("Total " + label) if metric in ('revenue', 'bookings', 'cancellations') else label:
+                  _format_value(metric, 0 if pd.isna(result) else result)}
+    elif len(result) == 0:
+        answer = {label: "No matching bookings"}
+    elif spec['top_k'] == 1:
+        direction = "Lowest" if spec['ascending'] else "Highest"
+        total = ("Total " + label) if metric in ('revenue', 'bookings', 'cancellations') else label
+        answer = {f"{DIMENSION_LABELS[dim]} with {direction} {label}": _format_key(dim, result.index[0]),
+                  total: _format_value(metric, result.iloc[0])}
+    else:
+        answer = {f"{label} by {DIMENSION_LABELS[dim]}": {_format_key(dim, key): _format_value(metric, value)
+                                                          for key, value in result.items()}}
+
+    # Echo the filters that were applied
+    filters = spec['filters']
+    if 'month' in filters:
+        answer["Month"] = MONTH_NAMES[filters['month'] - 1]
+    if 'year' in filters:
+        answer["Year"] = str(filters['year'])
+    if 'country' in filters:
+        answer["Country"] = filters['country']
+    if 'hotel' in filters:
+        answer["Hotel"] = filters['hotel']
+    return answer
+
+
+# Answer a question from the cube, or return None if it needs retrieval + LLM
+def answer_structured(question: str, cube):
+    spec = parse_question(question, cube.country_names)
+    if spec is None:
+        return None
+    return format_answer(spec, run_query(spec, cube))
+
+
+# answer_structured over many questions: specs with the same filters share one masked
+# subset of the group index, so a batch costs one mask per distinct filter set
+def answer_structured_batch(questions, cube) -> list:
+    subsets, answers = {}, []
+    for question in questions:
+        spec = parse_question(question, cube.country_names)
+        if spec is None:
+            answers.append(None)
+            continue
+        filters = _applied_filters(spec)
+        key = tuple(sorted(filters.items()))
+        if key not in subsets:
+            subsets[key] = _subset(cube.groups, filters)
+        answers.append(format_answer(spec, _aggregate(spec, subsets[key])))
+    return answers
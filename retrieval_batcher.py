@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# File: retrieval_batcher.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+import numpy as np
+
+
+# Micro-batches retrieval for concurrent requests: queries that arrive within
+# `max_wait` seconds of each other (up to `max_batch_size`) are encoded and
+# searched as one matrix call, and each caller gets its own row back. Queries
+# restricted to a set of row ids are encoded with the batch but searched one by one.
+class RetrievalBatcher:
+    def __init__(self, encode: Callable, search: Callable, k: int = 5,
+                 max_batch_size: int = 32, max_wait: float = 0.005):
+        self.encode = encode  # list of str -> (n, dim) array
+        self.search = search  # ((n, dim) float32 array, k, ids=None) -> (D, I)
+        self.k = k
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.queries = 0
+
+    def _ensure_worker(self):
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="retrieval-batcher", daemon=True)
+                self._worker.start()
+
+    # Returns a Future resolving to (query_embedding, distances, ids), each a 1-row array.
+    # `ids` restricts the search to those row ids.
+    def submit(self, query: str, ids=None) -> Future:
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((query, ids, future))
+        return future
+
+    def retrieve(self, query: str, ids=None):
+        return self.submit(query, ids).result()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            queries = [query for query, _, _ in batch]
+            futures = [future for _, _, future in batch]
+            try:
+                embeddings = np.asarray(self.encode(queries), dtype=np.float32)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.queries += len(batch)
+
+            unfiltered = [row for row, (_, ids, _) in enumerate(batch) if ids is None]
+            try:
+                if unfiltered:
+                    D, I = self.search(embeddings[unfiltered], self.k)
+            except Exception as e:
+                for row in unfiltered:
+                    futures[row].set_exception(e)
+                unfiltered = []
+            for pos, row in enumerate(unfiltered):
+                futures[row].set_result((embeddings[row:row + 1], D[pos:pos + 1], I[pos:pos + 1]))
+
+            for row, (_, ids, future) in enumerate(batch):
+                if ids is None:
+                    continue
+                try:
+                    future.set_result((embeddings[row:row + 1],) + tuple(self.search(embeddings[row:row + 1], self.k, ids)))
+                except Exception as e:
+                    future.set_exception(e)
+
+    def stats(self) -> dict:
+        return {"batches": self.batches, "queries": self.queries,
+                "avg_batch_size": self.queries / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_batch_size, "max_wait": self.max_wait}
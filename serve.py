@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# File: serve.py
+import argparse
+import os
+
+import pandas as pd
+
+from analytics_cube import FilterIndex, store_filter_index
+from columnar_store import CSV_PATH, SERVING_COLUMNS, STORE_PATH, has_store, load_bookings, save_columnar
+from faiss_index import INDEX_PATH
+
+
+# Loader step: make sure the memory-mappable artifacts exist before any worker starts,
+# so every worker attaches to the same files instead of parsing the CSV itself
+def publish_artifacts(csv_path: str = CSV_PATH, store_path: str = STORE_PATH, index_path: str = INDEX_PATH):
+    if not has_store(store_path):
+        print(f"Building columnar store '{store_path}' from '{csv_path}'...")
+        df = pd.read_csv(csv_path)
+        df['arrival_date'] = pd.to_datetime(df['arrival_date'])
+        save_columnar(df, store_path)
+    # Build the filter index once so workers only map it (a no-op when it is current)
+    path, version = store_filter_index(store_path)
+    FilterIndex(load_bookings(store_path, columns=SERVING_COLUMNS), path, version)
+    if not os.path.exists(index_path):
+        raise FileNotFoundError(f"'{index_path}' not found; build it with faiss_index.py")
+    print(f"Workers will map '{store_path}' and '{index_path}' read-only.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the API with several workers sharing one dataset and index")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--host', default="0.0.0.0")
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+
+    publish_artifacts()
+    os.environ["API_SHARED"] = "1"
+    # Each worker runs its own retrieval batcher and thread pool; keep per-worker pools small
+    os.environ.setdefault("API_WORKER_THREADS", "2")
+
+    import uvicorn
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers)
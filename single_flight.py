@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# File: single_flight.py
+import asyncio
+from typing import Awaitable, Callable, Hashable
+
+
+# Coalesces identical concurrent calls: the first caller for a key starts the work as
+# a task, and callers arriving while it runs await the same task instead of starting
+# their own. The task is shielded, so one caller disconnecting doesn't cancel it for
+# the others. Keys are forgotten as soon as the work finishes (this is not a cache).
+class SingleFlight:
+    def __init__(self):
+        self._tasks = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # mark as retrieved when every caller has gone away
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable]):
+        task = self._tasks.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._done(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        calls = self.leaders + self.coalesced
+        return {"in_flight": len(self._tasks), "leaders": self.leaders, "coalesced": self.coalesced,
+                "coalesced_ratio": self.coalesced / calls if calls else 0.0}
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics_cube import AnalyticsCube
+from booking_engine import BookingEngine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 500
+    data = pd.DataFrame({
+        'arrival_date': pd.Timestamp('2016-01-01') + pd.to_timedelta(rng.integers(0, 700, n), unit='D'),
+        'hotel': rng.choice(['Resort Hotel', 'City Hotel'], n),
+        'country': rng.choice(['PRT', 'GBR', 'FRA'], n),
+        'market_segment': ['Online TA'] * n,
+        'is_canceled': rng.integers(0, 2, n),
+        'lead_time': rng.integers(0, 400, n),
+        'total_nights': rng.integers(1, 10, n),
+        'adr': rng.uniform(50, 200, n),
+        'revenue': rng.uniform(50, 2000, n),
+    })
+    engine = BookingEngine(store_path=str(tmp_path / 'missing.store'))
+    engine.data, engine.cube = data, AnalyticsCube(data)
+    return engine
+
+
+def test_lead_time_distribution_at_chart_resolution(engine):
+    report = engine.analytics("lead_time_distribution", bins=50)["lead_time_distribution"]
+    assert len(report) == 50
+    assert sum(report.values()) == len(engine.data)
+    expected = pd.cut(engine.data['lead_time'], bins=50).value_counts(sort=False)
+    assert list(report.values()) == expected.tolist()
+
+
+def test_filtered_lead_time_distribution_takes_bins(engine):
+    report = engine.analytics("lead_time_distribution", {'country': 'PRT'}, bins=50)
+    assert len(report["lead_time_distribution"]) == 50
+    assert sum(report["lead_time_distribution"].values()) == report["matched_rows"]
+
+
+def test_bins_are_validated(engine):
+    with pytest.raises(ValueError):
+        engine.analytics("lead_time_distribution", bins=0)
+
+
+def test_filter_index_files_are_shared_and_rebuilt_for_new_data(engine, tmp_path):
+    from analytics_cube import FilterIndex
+    data, path = engine.data, str(tmp_path / 'filter_index')
+    private = FilterIndex(data)
+    built = FilterIndex(data, path, version=1)
+    mapped = FilterIndex(data, path, version=1)
+    assert isinstance(mapped.order, np.memmap) and isinstance(mapped.codes['country'], np.memmap)
+    start, end = pd.Timestamp('2016-03-01'), pd.Timestamp('2016-09-30')
+    for index in (built, mapped):
+        np.testing.assert_array_equal(index.select(start, end, country='PRT', is_canceled=0),
+                                      private.select(start, end, country='PRT', is_canceled=0))
+        assert index.revenue_trends(index.select()) == private.revenue_trends(private.select())
+
+    more = pd.concat([data, data.iloc[:10]], ignore_index=True)
+    assert len(FilterIndex(more, path, version=1).order) == len(more)  # row count changed
+    assert len(FilterIndex(more, path, version=2).select()) == len(more)
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from bounded_executor import AdmissionLimit, BoundedExecutor, Overloaded
+
+
+def test_check_rejects_when_full_without_taking_a_slot():
+    limit = AdmissionLimit(max_in_flight=1)
+    limit.check()
+    assert limit.in_flight == 0
+    with limit.slot():
+        with pytest.raises(Overloaded):
+            limit.check()
+        with pytest.raises(Overloaded):
+            with limit.slot():
+                pass
+    assert limit.in_flight == 0
+    assert limit.rejected == 2
+
+
+# A streaming body that takes its slot when it starts, as api.stream_answer does
+async def body(limit):
+    with limit.slot():
+        yield "event"
+
+
+def test_slot_taken_in_a_generator_is_not_held_before_it_starts_or_after_close():
+    limit = AdmissionLimit(max_in_flight=1)
+    unstarted = body(limit)  # a client that left before the response started
+    assert limit.in_flight == 0
+
+    async def consume_one():
+        stream = body(limit)
+        assert await stream.__anext__() == "event"
+        assert limit.in_flight == 1
+        await stream.aclose()  # client disconnects mid-stream
+
+    asyncio.run(consume_one())
+    assert limit.in_flight == 0
+    del unstarted
+
+
+def test_bounded_executor_runs_and_rejects_beyond_pending():
+    async def scenario():
+        pool = BoundedExecutor(max_workers=1, max_pending=0)
+        assert await pool.run(sum, [1, 2, 3]) == 6
+        with pool._limit.slot():
+            with pytest.raises(Overloaded):
+                await pool.run(sum, [1])
+        return pool.stats()
+
+    assert asyncio.run(scenario())["rejected"] == 1
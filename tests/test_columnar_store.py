@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from columnar_store import load_columnar, save_columnar
+
+
+def sample_frame():
+    return pd.DataFrame({
+        'arrival_date': pd.to_datetime(['2016-07-01', '2016-07-02', '2017-01-15']),
+        'hotel': ['Resort Hotel', 'City Hotel', 'City Hotel'],
+        'is_canceled': [0, 1, 0],
+        'lead_time': [10, 300, 45],
+        'revenue': [120.5, 0.0, 99.99],
+        'text': ['first booking', 'second booking', 'third booking'],
+    })
+
+
+def test_round_trip_all_columns(tmp_path):
+    df = sample_frame()
+    embeddings = np.arange(6, dtype=np.float32).reshape(3, 2)
+    save_columnar(df, str(tmp_path), embeddings=embeddings)
+
+    loaded = load_columnar(str(tmp_path))
+    assert list(loaded.columns) == list(df.columns)
+    assert len(loaded) == 3
+    assert loaded['hotel'].astype(str).tolist() == df['hotel'].tolist()
+    assert loaded['lead_time'].tolist() == df['lead_time'].tolist()
+    assert loaded['revenue'].tolist() == df['revenue'].tolist()
+    assert loaded['text'].tolist() == df['text'].tolist()
+    assert (loaded['arrival_date'] == df['arrival_date']).all()
+
+
+def test_round_trip_selected_columns(tmp_path):
+    save_columnar(sample_frame(), str(tmp_path))
+
+    loaded = load_columnar(str(tmp_path), columns=['hotel', 'revenue'])
+    assert list(loaded.columns) == ['hotel', 'revenue']
+    assert len(loaded) == 3
+
+    without_text = load_columnar(str(tmp_path), skip_text=True)
+    assert 'text' not in without_text.columns
+    assert len(without_text) == 3
+
+
+def test_append_widens_columns_and_adds_categories(tmp_path):
+    from columnar_store import append_columnar
+
+    df = sample_frame()
+    save_columnar(df, str(tmp_path))
+    more = pd.DataFrame({
+        'arrival_date': pd.to_datetime(['2018-02-01']),
+        'hotel': ['Airport Hotel'],
+        'is_canceled': [1],
+        'lead_time': [100000],  # past the int16 the column was stored as
+        'revenue': [10.25],
+        'text': ['fourth booking'],
+    })
+    append_columnar(more, str(tmp_path))
+
+    loaded = load_columnar(str(tmp_path))
+    assert len(loaded) == 4
+    assert loaded['lead_time'].tolist() == [10, 300, 45, 100000]
+    assert loaded['hotel'].astype(str).tolist() == ['Resort Hotel', 'City Hotel', 'City Hotel', 'Airport Hotel']
+    assert loaded['text'].tolist()[-1] == 'fourth booking'
+    assert loaded['arrival_date'].iloc[-1] == pd.Timestamp('2018-02-01')
@@ -0,0 +1,27 @@
+import pandas as pd
+
+from context_builder import build_context
+
+
+def frame():
+    return pd.DataFrame({
+        'hotel': ['City Hotel', 'Resort Hotel', 'City Hotel', 'City Hotel'],
+        'country': ['PRT', 'GBR', 'PRT', 'FRA'],
+        'arrival_date': pd.to_datetime(['2016-07-01', '2016-07-02', '2016-07-01', '2016-08-01']),
+        'lead_time': [10, 20, 10, 30],
+        'adr': [100.2, 80.0, 99.9, 120.0],
+        'is_canceled': [0, 1, 0, 0],
+    })
+
+
+def test_shared_row_memo_gives_the_same_contexts():
+    data, summary = frame(), {"bookings": 4}
+    memo = {}
+    for ids in ([0, 1, 2], [2, 3], [3, 0, 1]):
+        assert build_context(data, ids, summary, memo=memo) == build_context(data, ids, summary)
+    assert set(memo) == {0, 1, 2, 3}
+
+
+def test_identical_rows_collapse_with_a_count():
+    context = build_context(frame(), [0, 2, 1], {"bookings": 4})
+    assert context.splitlines()[2] == "City Hotel|PRT|2016-07-01|10|100|0|2"
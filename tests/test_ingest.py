@@ -0,0 +1,104 @@
+import zlib
+
+import faiss
+import numpy as np
+import pandas as pd
+import pytest
+
+import ingest
+from columnar_store import append_columnar, load_columnar, load_embeddings, read_meta, save_columnar
+from faiss_index import load_index
+
+DIM = 8
+
+
+# Deterministic stand-in for the sentence embedding model: a vector seeded by the text
+def fake_embed(texts, batch_size=256):
+    return np.vstack([np.random.default_rng(zlib.crc32(t.encode())).standard_normal(DIM).astype(np.float32)
+                      for t in texts]).reshape(-1, DIM)
+
+
+def raw_rows(start, count, countries=('PRT', 'GBR')):
+    n = np.arange(start, start + count)
+    return pd.DataFrame({
+        'hotel': np.where(n % 2 == 0, 'Resort Hotel', 'City Hotel'),
+        'is_canceled': n % 2,
+        'lead_time': n * 10,
+        'arrival_date_year': 2016,
+        'arrival_date_month': 'July',
+        'arrival_date_day_of_month': n % 28 + 1,
+        'stays_in_weekend_nights': 1,
+        'stays_in_week_nights': n % 5,
+        'adults': 2,
+        'children': np.nan,
+        'country': [countries[i % len(countries)] for i in range(count)],
+        'adr': 100.0 + n,
+        'agent': 9.0,
+        'company': np.nan,
+        'reservation_status_date': '2016-07-01',
+    })
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, 'embed_texts', fake_embed)
+    rows = ingest.prepare_rows(raw_rows(0, 20))
+    embeddings = fake_embed(rows['text'].tolist())
+    store, index_path = str(tmp_path / 'bookings.store'), str(tmp_path / 'index.faiss')
+    save_columnar(rows, store, embeddings)
+    index = faiss.IndexFlatL2(DIM)
+    index.add(embeddings)
+    faiss.write_index(index, index_path)
+    return store, index_path
+
+
+def test_ingest_twice_keeps_rows_and_embeddings_aligned(files):
+    store, index_path = files
+    assert ingest.ingest_files(raw_rows(20, 5), store, index_path) == 5
+    # a country and a lead time the first rows never had
+    assert ingest.ingest_files(raw_rows(25, 300, countries=('FRA',)), store, index_path) == 300
+
+    data = load_columnar(store)
+    embeddings = load_embeddings(store)
+    index = load_index(index_path)
+    assert len(data) == read_meta(store)['rows'] == len(embeddings) == index.ntotal == 325
+    assert data['lead_time'].tolist() == [i * 10 for i in range(325)]
+    assert set(data['country'].astype(str)) == {'PRT', 'GBR', 'FRA'}
+    assert data['country'].astype(str).tolist()[25:] == ['FRA'] * 300
+    np.testing.assert_array_equal(embeddings, fake_embed(data['text'].tolist()))
+    for row in (0, 19, 20, 24, 324):
+        _, I = index.search(embeddings[row:row + 1], 1)
+        assert I[0][0] == row
+
+
+def test_rows_past_meta_are_ignored_and_overwritten(files):
+    store, _ = files
+    rows = ingest.prepare_rows(raw_rows(20, 3))
+    append_columnar(rows, store, fake_embed(rows['text'].tolist()))
+    meta = read_meta(store)
+    meta['rows'] = 20  # as if the last append stopped before meta.json was replaced
+    with open(f"{store}/meta.json", 'w') as f:
+        import json
+        json.dump(meta, f)
+
+    assert len(load_columnar(store)) == 20
+    assert len(load_embeddings(store)) == 20
+    rows = ingest.prepare_rows(raw_rows(100, 2))
+    append_columnar(rows, store, fake_embed(rows['text'].tolist()))
+    data = load_columnar(store)
+    assert data['lead_time'].tolist()[20:] == [1000, 1010]
+    assert data['text'].tolist()[20:] == rows['text'].tolist()
+
+
+def test_engine_ingest_survives_reload(files, monkeypatch):
+    from booking_engine import BookingEngine
+    store, index_path = files
+    engine = BookingEngine(store_path=store, index_path=index_path).load()
+    monkeypatch.setattr(engine, 'encode', fake_embed)
+    assert engine.ingest(raw_rows(20, 5)) == 5
+    assert len(engine.data) == engine.get_index().ntotal == 25
+
+    engine.load()  # what /reload and a restart do
+    assert len(engine.data) == engine.get_index().ntotal == 25
+    assert engine.data['lead_time'].tolist()[20:] == [200, 210, 220, 230, 240]
+    assert load_columnar(store)['text'].tolist()[24:] == ingest.prepare_rows(raw_rows(24, 1))['text'].tolist()
@@ -0,0 +1,216 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from llm_client import CircuitBreaker, LLMClient, LLMUnavailable
+
+
+# Named like the google.api_core error, so the client treats it as retryable
+class ServiceUnavailable(Exception):
+    pass
+
+
+# Backend that plays a script: each call takes the next outcome (an exception is
+# raised, a string is returned) after `delay` seconds. Streams yield the text word by
+# word, or raise after `fail_after` chunks.
+class FakeBackend:
+    name = 'fake'
+
+    def __init__(self, outcomes, delay: float = 0.0, fail_after: int = None):
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def load(self):
+        return self
+
+    def _next(self):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else "ok"
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    async def generate(self, prompt, timeout):
+        await asyncio.sleep(self.delay)
+        return self._next()
+
+    def generate_sync(self, prompt, timeout):
+        time.sleep(self.delay)
+        return self._next()
+
+    async def stream(self, prompt, timeout):
+        await asyncio.sleep(self.delay)
+        for position, word in enumerate(self._next().split()):
+            if self.fail_after is not None and position == self.fail_after:
+                raise ServiceUnavailable("stream broke")
+            yield word
+
+    def stream_sync(self, prompt, timeout):
+        time.sleep(self.delay)
+        for position, word in enumerate(self._next().split()):
+            if self.fail_after is not None and position == self.fail_after:
+                raise ServiceUnavailable("stream broke")
+            yield word
+
+
+def client(backend, **kwargs):
+    options = {"timeout": 5.0, "max_retries": 2, "backoff": 0.0, "concurrency": 4}
+    return LLMClient(backend, **{**options, **kwargs})
+
+
+def test_retries_retryable_errors_then_succeeds():
+    backend = FakeBackend([ServiceUnavailable("busy"), TimeoutError(), "answer"])
+    llm = client(backend)
+    assert llm.generate_sync("q") == "answer"
+    assert backend.calls == 3
+    assert llm.stats()["retries"] == 2 and llm.stats()["timeouts"] == 1 and llm.stats()["failures"] == 1
+    assert llm.breaker.state == 'closed'
+
+
+def test_async_retries_use_the_same_logic():
+    backend = FakeBackend([ConnectionError(), "answer"])
+    llm = client(backend)
+    assert asyncio.run(llm.generate("q")) == "answer"
+    assert backend.calls == 2 and llm.stats()["retries"] == 1
+
+
+def test_gives_up_after_max_retries():
+    backend = FakeBackend([ServiceUnavailable()] * 5)
+    llm = client(backend, max_retries=2)
+    with pytest.raises(LLMUnavailable):
+        llm.generate_sync("q")
+    assert backend.calls == 3
+
+
+def test_non_retryable_errors_are_not_retried():
+    backend = FakeBackend([ValueError("bad request"), "answer"])
+    llm = client(backend)
+    with pytest.raises(LLMUnavailable):
+        llm.generate_sync("q")
+    assert backend.calls == 1 and llm.stats()["retries"] == 0
+
+
+def test_backoff_grows_and_is_capped(monkeypatch):
+    delays = []
+    monkeypatch.setattr('llm_client.random.uniform', lambda low, high: delays.append(high) or 0.0)
+    llm = client(FakeBackend([ServiceUnavailable()] * 4), max_retries=3, backoff=0.5, max_backoff=1.0)
+    with pytest.raises(LLMUnavailable):
+        llm.generate_sync("q")
+    assert delays == [0.5, 1.0, 1.0]
+
+
+def test_attempts_share_one_deadline():
+    backend = FakeBackend(["late"] * 5, delay=0.3)
+    llm = client(backend, timeout=0.2, max_retries=5)
+    start = time.monotonic()
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(llm.generate("q"))
+    assert time.monotonic() - start < 0.5
+    assert backend.calls == 0 and llm.stats()["timeouts"] == 1
+
+
+def test_no_retry_when_the_backoff_passes_the_deadline(monkeypatch):
+    monkeypatch.setattr('llm_client.random.uniform', lambda low, high: high)
+    backend = FakeBackend([ServiceUnavailable(), "answer"])
+    llm = client(backend, timeout=0.5, backoff=1.0, max_backoff=1.0)
+    with pytest.raises(LLMUnavailable):
+        llm.generate_sync("q")
+    assert backend.calls == 1 and llm.stats()["retries"] == 0
+
+
+def test_breaker_opens_rejects_then_closes_after_a_successful_trial():
+    backend = FakeBackend([ServiceUnavailable(), ServiceUnavailable(), "recovered"])
+    llm = client(backend, max_retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=0.1))
+    for _ in range(2):
+        with pytest.raises(LLMUnavailable):
+            llm.generate_sync("q")
+    assert llm.breaker.state == 'open'
+
+    with pytest.raises(LLMUnavailable, match="circuit breaker"):
+        llm.generate_sync("q")
+    assert backend.calls == 2 and llm.stats()["rejected"] == 1
+
+    time.sleep(0.12)
+    assert llm.generate_sync("q") == "recovered"
+    assert llm.breaker.state == 'closed' and llm.breaker.failures == 0
+
+
+def test_half_open_lets_one_trial_through_and_reopens_on_failure():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    assert not breaker.allow()  # only one trial at a time
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+
+
+def test_released_trial_lets_the_next_call_try():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.release()  # the trial was cancelled without an outcome
+    assert breaker.allow()
+
+
+def test_async_calls_beyond_concurrency_are_rejected():
+    llm = client(FakeBackend(["slow", "fast"], delay=0.3), timeout=1.0, concurrency=1)
+
+    async def scenario():
+        first = asyncio.ensure_future(llm.generate("q"))
+        await asyncio.sleep(0.05)
+        llm.timeout = 0.1  # the second call's deadline passes while it waits for the slot
+        with pytest.raises(LLMUnavailable, match="in flight"):
+            await llm.generate("q")
+        assert await first == "slow"
+
+    asyncio.run(scenario())
+    assert llm.stats()["rejected"] == 1
+
+
+def test_sync_calls_beyond_concurrency_are_rejected():
+    llm = client(FakeBackend(["slow", "fast"], delay=0.3), timeout=1.0, concurrency=1)
+    worker = threading.Thread(target=llm.generate_sync, args=("q",))
+    worker.start()
+    time.sleep(0.05)
+    llm.timeout = 0.1
+    with pytest.raises(LLMUnavailable, match="in flight"):
+        llm.generate_sync("q")
+    worker.join()
+    assert llm.stats()["rejected"] == 1
+
+
+def test_stream_retries_only_before_the_first_chunk():
+    backend = FakeBackend([ServiceUnavailable(), "one two three"])
+    llm = client(backend)
+    assert list(llm.stream_sync("q")) == ["one", "two", "three"]
+    assert backend.calls == 2
+
+    broken = FakeBackend(["one two three", "one two three"], fail_after=1)
+    llm = client(broken)
+    chunks = []
+    with pytest.raises(LLMUnavailable):
+        for chunk in llm.stream_sync("q"):
+            chunks.append(chunk)
+    assert chunks == ["one"] and broken.calls == 1
+
+
+def test_async_stream_fails_midway_without_retrying():
+    broken = FakeBackend(["one two three"] * 2, fail_after=2)
+    llm = client(broken)
+
+    async def collect():
+        chunks = []
+        with pytest.raises(LLMUnavailable):
+            async for chunk in llm.stream("q"):
+                chunks.append(chunk)
+        return chunks
+
+    assert asyncio.run(collect()) == ["one", "two"]
+    assert broken.calls == 1
@@ -0,0 +1,62 @@
+import pytest
+
+from query_engine import extract_filters, parse_question
+
+
+@pytest.mark.parametrize("question", [
+    "Why do people cancel bookings?",
+    "What are the main reasons guests cancel?",
+    "Which factors affect cancellations?",
+    "How does lead time impact cancellations?",
+    "Give me insights on bookings from Portugal",
+    "Describe the reservations made in July 2016",
+    "What can we learn from these bookings?",
+    "Tell me about bookings in 2016",
+    "What are the revenue trends over time?",
+])
+def test_qualitative_questions_go_to_retrieval(question):
+    assert parse_question(question, ['PRT']) is None
+
+
+@pytest.mark.parametrize("question, metric", [
+    ("What’s the total revenue for July 2016?", 'revenue'),
+    ("What's the revenue for July 2016?", 'revenue'),
+    ("What’s the cancellation rate?", 'cancellation_rate'),
+    ("Which country has the highest booking cancellations?", 'cancellations'),
+    ("How many bookings were there in July 2016?", 'bookings'),
+    ("What’s the typical lead time for bookings from Portugal?", 'lead_time'),
+    ("Top 5 countries by revenue in 2016", 'revenue'),
+    ("How much did we earn in 2016?", 'revenue'),
+])
+def test_quantitative_questions_are_compiled(question, metric):
+    spec = parse_question(question, ['PRT'])
+    assert spec is not None
+    assert spec['metric'] == metric
+
+
+@pytest.mark.parametrize("question", [
+    "How many bookings had children?",
+    "How many bookings were made less than 30 days before arrival?",
+    "How many bookings are made by each market segment?",
+    "What percentage of bookings come from Portugal?",
+    "What's the median lead time?",
+    "What is the total revenue in South America?",
+    "Which city has the most bookings?",
+])
+def test_unrepresentable_questions_are_not_compiled(question):
+    assert parse_question(question, ['PRT', 'USA']) is None
+
+
+def test_breakdown_in_a_what_question_is_not_cut_to_one():
+    spec = parse_question("What's the cancellation rate by year?")
+    assert spec['group_by'] == 'year'
+    assert spec['top_k'] is None
+
+
+def test_hotel_slot_needs_city_hotel():
+    assert 'hotel' not in extract_filters("Bookings in the city centre")
+    assert extract_filters("Revenue of the City Hotel")['hotel'] == 'City Hotel'
+
+
+def test_earn_does_not_match_inside_words():
+    assert parse_question("What's the number of guests who learned about us online?") is None
@@ -0,0 +1,94 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from retrieval_batcher import RetrievalBatcher
+
+DIM = 4
+
+
+class FakeIndex:
+    def __init__(self):
+        self.encode_calls, self.search_calls = [], []
+        self.lock = threading.Lock()
+
+    def encode(self, queries):
+        with self.lock:
+            self.encode_calls.append(list(queries))
+        return np.array([[float(len(q)), 0, 0, 0] for q in queries], dtype=np.float32).reshape(-1, DIM)
+
+    # Row i of the result is the query length, so callers can check they got their own row
+    def search(self, embeddings, k, ids=None):
+        with self.lock:
+            self.search_calls.append((len(embeddings), ids))
+        lengths = embeddings[:, :1].astype(np.int64)
+        I = np.repeat(lengths, k, axis=1) if ids is None else np.tile(np.asarray(ids)[:k], (len(embeddings), 1))
+        return np.zeros(I.shape, dtype=np.float32), I
+
+
+def test_concurrent_queries_are_encoded_and_searched_together():
+    fake = FakeIndex()
+    batcher = RetrievalBatcher(fake.encode, fake.search, k=2, max_batch_size=8, max_wait=0.2)
+    queries = ["a" * n for n in range(1, 9)]
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(batcher.retrieve, queries))
+
+    for query, (embedding, D, I) in zip(queries, results):
+        assert embedding.shape == (1, DIM) and I.shape == (1, 2)
+        assert I[0].tolist() == [len(query)] * 2
+    assert sum(len(call) for call in fake.encode_calls) == 8
+    assert len(fake.encode_calls) < 8 and batcher.stats()["batches"] == len(fake.encode_calls)
+
+
+def test_batches_are_capped_at_max_batch_size():
+    fake = FakeIndex()
+    batcher = RetrievalBatcher(fake.encode, fake.search, max_batch_size=3, max_wait=0.2)
+    futures = [batcher.submit(f"q{i}") for i in range(7)]
+    for future in futures:
+        future.result(timeout=5)
+    assert max(len(call) for call in fake.encode_calls) <= 3
+
+
+def test_restricted_queries_are_searched_one_by_one_within_their_ids():
+    fake = FakeIndex()
+    batcher = RetrievalBatcher(fake.encode, fake.search, k=2, max_wait=0.2)
+    restricted = batcher.submit("abc", ids=np.array([7, 9]))
+    unrestricted = batcher.submit("abcd")
+    assert restricted.result(timeout=5)[2][0].tolist() == [7, 9]
+    assert unrestricted.result(timeout=5)[2][0].tolist() == [4, 4]
+    restricted_calls = [ids for _, ids in fake.search_calls if ids is not None]
+    assert len(restricted_calls) == 1
+
+
+def test_encode_errors_fail_the_batch_and_the_worker_keeps_going():
+    fake = FakeIndex()
+    failing = {"on": True}
+
+    def encode(queries):
+        if failing["on"]:
+            raise RuntimeError("model not loaded")
+        return fake.encode(queries)
+
+    batcher = RetrievalBatcher(encode, fake.search, max_wait=0.01)
+    with pytest.raises(RuntimeError):
+        batcher.retrieve("a")
+    failing["on"] = False
+    assert batcher.retrieve("ab")[2][0][0] == 2
+
+
+def test_search_errors_reach_only_the_affected_callers():
+    fake = FakeIndex()
+
+    def search(embeddings, k, ids=None):
+        if ids is None:
+            raise RuntimeError("index gone")
+        return fake.search(embeddings, k, ids)
+
+    batcher = RetrievalBatcher(fake.encode, search, k=1, max_wait=0.2)
+    unrestricted = batcher.submit("a")
+    restricted = batcher.submit("b", ids=np.array([3]))
+    with pytest.raises(RuntimeError):
+        unrestricted.result(timeout=5)
+    assert restricted.result(timeout=5)[2][0].tolist() == [3]
@@ -0,0 +1,71 @@
+import pandas as pd
+import pytest
+
+from analytics_cube import AnalyticsCube
+from booking_engine import NO_MATCH, BookingEngine, is_empty_scope
+
+
+@pytest.fixture
+def engine(tmp_path):
+    data = pd.DataFrame({
+        'arrival_date': pd.to_datetime(['2016-07-01', '2016-07-15', '2017-03-02', '2017-07-20']),
+        'hotel': ['Resort Hotel', 'City Hotel', 'City Hotel', 'Resort Hotel'],
+        'country': ['PRT', 'GBR', 'PRT', 'FRA'],
+        'market_segment': ['Online TA'] * 4,
+        'is_canceled': [0, 1, 0, 0],
+        'lead_time': [10, 200, 35, 60],
+        'total_nights': [3, 2, 5, 7],
+        'adr': [100.0, 80.0, 120.0, 90.0],
+        'revenue': [300.0, 160.0, 600.0, 630.0],
+    })
+    engine = BookingEngine(store_path=str(tmp_path / 'missing.store'))
+    engine.data, engine.cube = data, AnalyticsCube(data)
+    return engine
+
+
+def test_filters_matching_nothing_give_an_empty_scope(engine):
+    ids, filters, summary = engine.retrieval_scope("Why did guests cancel in 2030?")
+    assert is_empty_scope(ids)
+    assert filters == {'year': 2030}
+    assert engine.ask("Why did guests cancel in 2030?") == {"answer": NO_MATCH, "filters": {'year': 2030}}
+
+    ids, _, _ = engine.retrieval_scope("Why did guests cancel?", {'country': 'ZZZ'})
+    assert is_empty_scope(ids)
+
+
+def test_matching_filters_restrict_retrieval(engine):
+    ids, filters, summary = engine.retrieval_scope("Why did guests from Portugal cancel?")
+    assert filters == {'country': 'PRT'}
+    assert sorted(ids.tolist()) == [0, 2]
+    assert summary['bookings'] == 2
+
+
+def test_month_without_year_is_not_applied(engine):
+    ids, filters, summary = engine.retrieval_scope("Why do guests cancel in July?")
+    assert ids is None
+    assert filters == {}
+    assert summary['bookings'] == 4
+
+
+def test_summary_describes_the_rows_retrieval_searches(engine):
+    whole = engine.cube.summary()
+    ids, _, summary = engine.retrieval_scope("Why did guests cancel?", {'market_segment': 'Online TA'})
+    assert ids is None  # not a retrieval filter
+    assert summary == whole
+
+    # A filter matching every row searches the whole dataset, with its aggregates
+    resort = engine.data[engine.data['hotel'] == 'Resort Hotel'].reset_index(drop=True)
+    engine.data, engine.cube = resort, AnalyticsCube(resort)
+    ids, filters, summary = engine.retrieval_scope("Why do resort guests cancel?")
+    assert ids is None
+    assert filters == {'hotel': 'Resort Hotel'}
+    assert summary == engine.cube.summary()
+
+
+
+def test_filtered_summary_counts_the_searched_rows(engine):
+    ids, _, summary = engine.retrieval_scope("Why do resort guests cancel?")
+    assert summary['bookings'] == len(ids) == 2
+
+    _, _, summary = engine.retrieval_scope("Why do guests cancel?")
+    assert summary == engine.cube.summary()
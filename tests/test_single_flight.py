@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def test_concurrent_calls_for_one_key_share_one_run():
+    flight, runs = SingleFlight(), []
+
+    async def work():
+        runs.append(1)
+        run = len(runs)
+        await asyncio.sleep(0.05)
+        return run
+
+    async def scenario():
+        return await asyncio.gather(*[flight.run("key", work) for _ in range(5)], flight.run("other", work))
+
+    assert asyncio.run(scenario()) == [1, 1, 1, 1, 1, 2]
+    assert flight.stats()["leaders"] == 2 and flight.stats()["coalesced"] == 4
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_keys_are_forgotten_once_the_work_finishes():
+    flight, runs = SingleFlight(), []
+
+    async def work():
+        runs.append(1)
+        return len(runs)
+
+    async def scenario():
+        return [await flight.run("key", work), await flight.run("key", work)]
+
+    assert asyncio.run(scenario()) == [1, 2]
+
+
+def test_errors_reach_every_caller():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def scenario():
+        return await asyncio.gather(flight.run("key", work), flight.run("key", work), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_a_cancelled_caller_does_not_cancel_the_others():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def scenario():
+        leader = asyncio.ensure_future(flight.run("key", work))
+        follower = asyncio.ensure_future(flight.run("key", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == "done"